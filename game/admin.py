@@ -1,6 +1,8 @@
 from django.contrib import admin
+from .jobs import requeue_jobs
+from .search import search_pets
 from .models import (PetType, Shelter, Pet, HelpInfo, Favorite, 
-                     Sponsorship, HappyStory, FAQ, PetComparison, Comment, AdoptionApplication, PaymentInfo)
+                     Sponsorship, HappyStory, FAQ, PetComparison, Comment, AdoptionApplication, PaymentInfo, ImageJob)
 
 
 @admin.register(PetType)
@@ -18,10 +20,12 @@ class ShelterAdmin(admin.ModelAdmin):
 
 @admin.register(Pet)
 class PetAdmin(admin.ModelAdmin):
-    list_display = ['name', 'pet_type', 'age_in_years', 'shelter', 'is_adopted', 'date_added']
+    list_display = ['name', 'pet_type', 'age_in_years', 'shelter', 'is_adopted', 'favorites_count',
+                    'applications_count', 'date_added']
     list_filter = ['pet_type', 'shelter', 'is_adopted', 'date_added']
-    search_fields = ['name', 'character']
-    readonly_fields = ['date_added']
+    search_fields = ['name', 'history', 'character', 'special_needs']
+    search_help_text = 'Полнотекстовый поиск по кличке, истории, характеру и особенностям'
+    readonly_fields = ['date_added', 'favorites_count', 'comments_count', 'applications_count', 'sponsorship_total']
     
     fieldsets = (
         ('Основная информация', {
@@ -33,7 +37,16 @@ class PetAdmin(admin.ModelAdmin):
         ('Статус', {
             'fields': ('is_adopted', 'date_added')
         }),
+        ('Интерес', {
+            'fields': ('favorites_count', 'comments_count', 'applications_count', 'sponsorship_total')
+        }),
     )
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо ILIKE по search_fields используем полнотекстовый индекс
+        if not search_term:
+            return queryset, False
+        return search_pets(search_term, queryset), False
 
 
 @admin.register(HelpInfo)
@@ -153,3 +166,20 @@ class PaymentInfoAdmin(admin.ModelAdmin):
         # Добавляем help_text для полей
         form.base_fields['payment_type'].help_text = "Выберите тип платежа для отображения соответствующих полей"
         return form
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ['content_type', 'object_id', 'field_name', 'status', 'attempts', 'date_created', 'date_finished']
+    list_filter = ['status', 'content_type']
+    readonly_fields = ['content_type', 'object_id', 'field_name', 'attempts', 'error',
+                       'date_created', 'date_started', 'date_finished']
+    actions = ['requeue']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('content_type')
+    
+    @admin.action(description="Поставить повторно в очередь")
+    def requeue(self, request, queryset):
+        requeued, skipped = requeue_jobs(queryset.exclude(status='processing'), attempts=0, error='')
+        self.message_user(request, f"Поставлено в очередь: {len(requeued)}, уже в очереди: {len(skipped)}")
@@ -0,0 +1,376 @@
+"""
+JSON API каталога только для чтения (для сайтов-партнеров и мобильного
+приложения).
+
+    /api/pets/                 - питомцы из витрины PetCard, фильтры как в каталоге
+    /api/pets/<id>/            - полная информация о питомце
+    /api/shelters/             - приюты с числом питомцев
+    /api/happy-stories/        - опубликованные счастливые истории
+    /api/happy-stories/<id>/   - опубликованная счастливая история
+    /api/changes/?since=<n>    - что изменилось после записи журнала n
+
+Общие параметры списков: cursor (курсор из next/previous), limit (до
+API_MAX_LIMIT) и fields - список полей через запятую, остальные не
+выбираются из базы и не сериализуются.
+
+Ответы отдаются с сильным ETag, а страница питомца - и с Last-Modified по
+updated_at, поэтому опрос с If-None-Match / If-Modified-Since обходится
+ответом 304 без тела. У списков Last-Modified нет: счетчики и состав
+страницы меняются без updated_at, и 304 по дате отдал бы устаревший список -
+их версию описывает только ETag.
+
+Лента изменений позволяет партнеру один раз выгрузить каталог, а дальше
+забирать только измененные и удаленные объекты (см. game.changes).
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .changes import OBJECT_TYPES, assign_sequence, changes_since, is_pruned
+from .filters import SORT_OPTIONS, filter_pets
+from .forms import PetFilterForm
+from .models import HappyStory, Pet, PetCard, Shelter
+from .pagination import InvalidCursor, KeysetPaginator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+API_DEFAULT_LIMIT = 20
+API_MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _image_url(request, image):
+    return request.build_absolute_uri(image.url) if image else None
+
+
+def _absolute(request, url):
+    return request.build_absolute_uri(url) if url else None
+
+
+# Поле ответа -> (колонки модели, функция получения значения)
+PET_LIST_FIELDS = {
+    'id': (['id'], lambda card, request: card.pk),
+    'url': (['id'], lambda card, request: request.build_absolute_uri(card.get_absolute_url())),
+    'name': (['name'], lambda card, request: card.name),
+    'pet_type': (['pet_type', 'pet_type_name'], lambda card, request: {
+        'id': card.pet_type_id, 'name': card.pet_type_name,
+    }),
+    'shelter': (['shelter', 'shelter_name'], lambda card, request: {
+        'id': card.shelter_id, 'name': card.shelter_name,
+    }),
+    'age': (['age'], lambda card, request: card.age),
+    'age_display': (['age_display'], lambda card, request: card.age_display),
+    'age_bucket': (['age_bucket'], lambda card, request: card.age_bucket),
+    'thumbnail': (['thumbnail_url', 'photo_width', 'photo_height'], lambda card, request: {
+        'url': _absolute(request, card.thumbnail_url),
+        'width': card.photo_width,
+        'height': card.photo_height,
+    } if card.thumbnail_url else None),
+    'character': (['character_excerpt'], lambda card, request: card.character_excerpt),
+    'has_special_needs': (['has_special_needs'], lambda card, request: card.has_special_needs),
+    'favorites_count': (['favorites_count'], lambda card, request: card.favorites_count),
+    'comments_count': (['comments_count'], lambda card, request: card.comments_count),
+    'is_adopted': (['is_adopted'], lambda card, request: card.is_adopted),
+    'date_added': (['date_added'], lambda card, request: card.date_added),
+    'updated_at': (['updated_at'], lambda card, request: card.updated_at),
+}
+
+PET_DETAIL_FIELDS = {
+    'id': lambda pet, request: pet.pk,
+    'url': lambda pet, request: request.build_absolute_uri(pet.get_absolute_url()),
+    'name': lambda pet, request: pet.name,
+    'pet_type': lambda pet, request: {'id': pet.pet_type_id, 'name': pet.pet_type.name},
+    'shelter': lambda pet, request: {'id': pet.shelter_id, 'name': pet.shelter.name},
+    'age': lambda pet, request: pet.age,
+    'age_display': lambda pet, request: pet.age_in_years,
+    'photo': lambda pet, request: {
+        'url': _image_url(request, pet.photo),
+        'width': pet.photo_width,
+        'height': pet.photo_height,
+    } if pet.photo else None,
+    'history': lambda pet, request: pet.history,
+    'character': lambda pet, request: pet.character,
+    'special_needs': lambda pet, request: pet.special_needs,
+    'is_adopted': lambda pet, request: pet.is_adopted,
+    'date_added': lambda pet, request: pet.date_added,
+    'updated_at': lambda pet, request: pet.updated_at,
+}
+
+SHELTER_FIELDS = {
+    'id': (['id'], lambda shelter, request: shelter.pk),
+    'name': (['name'], lambda shelter, request: shelter.name),
+    'address': (['address'], lambda shelter, request: shelter.address),
+    'phone': (['phone'], lambda shelter, request: shelter.phone),
+    'email': (['email'], lambda shelter, request: shelter.email),
+    'website': (['website'], lambda shelter, request: shelter.website),
+    'description': (['description'], lambda shelter, request: shelter.description),
+    'pets_count': ([], lambda shelter, request: shelter.pets_count),
+}
+
+HAPPY_STORY_FIELDS = {
+    'id': (['id'], lambda story, request: story.pk),
+    'url': (['id'], lambda story, request: request.build_absolute_uri(
+        reverse('happy_story_detail', args=[story.pk])
+    )),
+    'pet': (['pet__id', 'pet__name'], lambda story, request: {'id': story.pet_id, 'name': story.pet.name}),
+    'title': (['title'], lambda story, request: story.title),
+    'story': (['story'], lambda story, request: story.story),
+    'new_owner_name': (['new_owner_name'], lambda story, request: story.new_owner_name),
+    'adoption_date': (['adoption_date'], lambda story, request: story.adoption_date),
+    'photo': (['photo_after', 'photo_after_width', 'photo_after_height'], lambda story, request: {
+        'url': _image_url(request, story.photo_after),
+        'width': story.photo_after_width,
+        'height': story.photo_after_height,
+    } if story.photo_after else None),
+    'date_created': (['date_created'], lambda story, request: story.date_created),
+}
+
+
+def parse_fields(request, available):
+    """Запрошенные поля (fields=a,b,c) в порядке объявления; по умолчанию - все"""
+    value = request.GET.get('fields', '').strip()
+    if not value:
+        return list(available)
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(available)
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return [name for name in available if name in requested]
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', API_DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= limit <= API_MAX_LIMIT:
+        raise ApiError(f'limit должен быть от 1 до {API_MAX_LIMIT}')
+    return limit
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def paginate(request, queryset, ordering, fields, field_map, extra_columns=()):
+    """Страница по курсору с выборкой только нужных колонок"""
+    columns = {column for name in fields for column in field_map[name][0]}
+    columns.update(name.lstrip('-') for name in ordering)
+    columns.update(extra_columns)
+    queryset = queryset.only(*columns)
+    paginator = KeysetPaginator(queryset, parse_limit(request), ordering=ordering)
+    try:
+        return paginator.get_page(request.GET.get('cursor'))
+    except InvalidCursor as e:
+        raise ApiError(str(e))
+
+
+def serialize(objects, fields, field_map, request):
+    return [{name: field_map[name][1](obj, request) for name in fields} for obj in objects]
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def json_response(request, build, etag=None, last_modified=None):
+    """
+    Ответ с поддержкой условных запросов. build() вызывается, только если
+    клиенту нужно тело; без etag он считается по содержимому.
+    """
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    body = None
+    if etag is None:
+        body = dumps(build())
+        etag = quote_etag(hashlib.sha1(body).hexdigest())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(body if body is not None else dumps(build()),
+                                content_type='application/json')
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Кешировать можно, но каждый раз с проверкой актуальности
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def error_response(error):
+    return HttpResponse(dumps({'error': str(error)}), status=error.status,
+                        content_type='application/json')
+
+
+def api_view(view):
+    """require_safe и единый формат ошибок"""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as e:
+            return error_response(e)
+    return wrapper
+
+
+@api_view
+def pet_list(request):
+    """Питомцы, ищущие дом; параметры фильтра и sort - как у каталога"""
+    fields = parse_fields(request, PET_LIST_FIELDS)
+    params = PetFilterForm(request.GET).get_params()
+    label, ordering = SORT_OPTIONS[params['sort']]
+    queryset = filter_pets(PetCard.objects.filter(is_adopted=False), params)
+    # Версия страницы - версии ее строк (счетчики меняются без updated_at)
+    version_columns = ['updated_at', 'favorites_count', 'comments_count']
+    page = paginate(request, queryset, ordering, fields, PET_LIST_FIELDS, version_columns)
+    etag = make_etag(request.get_full_path(), [
+        (card.pk, card.updated_at.timestamp(), card.favorites_count, card.comments_count)
+        for card in page
+    ])
+    return json_response(request, lambda: {
+        'results': serialize(page, fields, PET_LIST_FIELDS, request),
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    }, etag=etag)
+
+
+@api_view
+def pet_detail(request, pk):
+    """Полная информация о питомце (в том числе усыновленном)"""
+    fields = parse_fields(request, PET_DETAIL_FIELDS)
+    pet = Pet.objects.select_related('pet_type', 'shelter').filter(pk=pk).first()
+    if pet is None:
+        raise ApiError('Питомец не найден', status=404)
+    return json_response(
+        request,
+        lambda: {name: PET_DETAIL_FIELDS[name](pet, request) for name in fields},
+        etag=make_etag(request.get_full_path(), pet.pk, pet.updated_at.timestamp()),
+        last_modified=pet.updated_at,
+    )
+
+
+@api_view
+def shelter_list(request):
+    """Приюты с числом питомцев, ищущих дом"""
+    fields = parse_fields(request, SHELTER_FIELDS)
+    queryset = Shelter.objects.annotate(
+        pets_count=Count('petcard', filter=Q(petcard__is_adopted=False))
+    )
+    page = paginate(request, queryset, ('name', 'id'), fields, SHELTER_FIELDS)
+    return json_response(request, lambda: {
+        'results': serialize(page, fields, SHELTER_FIELDS, request),
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    })
+
+
+@api_view
+def happy_story_list(request):
+    """Опубликованные счастливые истории, сначала новые"""
+    fields = parse_fields(request, HAPPY_STORY_FIELDS)
+    queryset = HappyStory.objects.filter(is_published=True)
+    if 'pet' in fields:
+        queryset = queryset.select_related('pet')
+    page = paginate(request, queryset, ('-date_created', '-id'), fields, HAPPY_STORY_FIELDS)
+    return json_response(request, lambda: {
+        'results': serialize(page, fields, HAPPY_STORY_FIELDS, request),
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    })
+
+
+@api_view
+def happy_story_detail(request, pk):
+    """Опубликованная счастливая история"""
+    fields = parse_fields(request, HAPPY_STORY_FIELDS)
+    story = HappyStory.objects.select_related('pet').filter(pk=pk, is_published=True).first()
+    if story is None:
+        raise ApiError('История не найдена', status=404)
+    return json_response(request, lambda: {
+        name: HAPPY_STORY_FIELDS[name][1](story, request) for name in fields
+    })
+
+
+CHANGE_DETAIL_URLS = {
+    'pet': 'api_pet_detail',
+    'happy_story': 'api_happy_story_detail',
+}
+
+
+def serialize_change(entry, request):
+    url = None
+    if entry.action != 'deleted':
+        url = request.build_absolute_uri(
+            reverse(CHANGE_DETAIL_URLS[entry.object_type], args=[entry.object_id])
+        )
+    return {
+        'seq': entry.seq,
+        'type': entry.object_type,
+        'id': entry.object_id,
+        'action': entry.action,
+        'date': entry.date_created,
+        'url': url,
+    }
+
+
+@api_view
+def change_feed(request):
+    """
+    Изменения после записи since (по умолчанию - с начала журнала).
+
+    Клиент передает в следующий запрос since=next_since; пока has_more,
+    можно сразу запрашивать следующую порцию. Ответ 410 означает, что журнал
+    очищен дальше since и нужна полная синхронизация через списки.
+    """
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        raise ApiError('since должен быть числом')
+    if since < 0:
+        raise ApiError('since не может быть отрицательным')
+    object_type = request.GET.get('type') or None
+    if object_type and object_type not in OBJECT_TYPES.values():
+        raise ApiError(f'Неизвестный тип: {object_type}')
+    limit = parse_limit(request)
+
+    # Записи, которые не пронумеровал упавший после фиксации процесс
+    assign_sequence()
+    if is_pruned(since):
+        raise ApiError('Журнал изменений очищен, нужна полная синхронизация', status=410)
+
+    entries = changes_since(since, limit, object_type)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    next_since = entries[-1].seq if entries else since
+    return json_response(request, lambda: {
+        'results': [serialize_change(entry, request) for entry in entries],
+        'next_since': next_since,
+        'has_more': has_more,
+    }, etag=make_etag(request.get_full_path(), next_since, has_more))
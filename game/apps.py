@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from .cards import ensure_pet_cards
+        from .search import ensure_search_triggers
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(ensure_search_triggers, sender=self)
+        post_migrate.connect(ensure_pet_cards, sender=self)
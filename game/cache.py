@@ -0,0 +1,314 @@
+"""
+Кеш страниц и фрагментов шаблонов с инвалидацией по тегам.
+
+Каждая запись помечается тегами - моделями, от данных которых она зависит
+("game.faq", "game.pet" ...). У тега в общем кеше (CACHES['default']) хранится
+версия, и она входит в ключ записи. Сохранение или удаление объекта модели
+(сигналы post_save/post_delete, см. game.signals) меняет версию тега, после
+чего все зависящие от него записи перестают находиться и со временем
+вытесняются - перебирать и удалять ключи не нужно.
+
+Данные, которые меняются постоянно (счетчики интереса, game.counters),
+сбрасывают свой тег с ограничением частоты (invalidate_throttled): иначе
+каждое добавление в избранное сбрасывало бы кеш каталога.
+
+Записи хранятся в двух уровнях: небольшой LRU в памяти процесса и общий
+кеш. Версии тегов всегда читаются из общего кеша (одним get_many), поэтому
+изменение в админке сразу видно во всех процессах.
+
+Настройки:
+    PAGE_CACHE_TIMEOUT - время жизни записи в общем кеше, секунд
+    PAGE_CACHE_LOCAL_SIZE - число записей в кеше процесса (0 - не использовать)
+    COUNTERS_CACHE_INTERVAL - интервал сброса тега счетчиков (game.counters)
+"""
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+
+CACHE_ALIAS = 'default'
+KEY_PREFIX = 'tagged'
+
+# Счетчики сбрасываются в общий кеш пачками, чтобы не делать incr на каждый запрос
+STATS_FLUSH_EVERY = 100
+STATS_KEYS = ('local_hits', 'shared_hits', 'misses')
+
+
+class LocalLRUCache:
+    """Кеш в памяти процесса: не больше max_size записей, у каждой свой срок"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LocalLRUCache(getattr(settings, 'PAGE_CACHE_LOCAL_SIZE', 200))
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def shared_cache():
+    return caches[CACHE_ALIAS]
+
+
+def default_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+
+
+def model_tag(model):
+    """Тег для данных модели: "game.faq" """
+    return model._meta.label_lower
+
+
+def _tag_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def _throttle_key(tag):
+    return f'{KEY_PREFIX}:tag-throttle:{tag}'
+
+
+def _dirty_key(tag):
+    return f'{KEY_PREFIX}:tag-dirty:{tag}'
+
+
+def tag_versions(tags):
+    """
+    Текущие версии тегов; у тега без версии она создается. Отложенный сброс
+    (invalidate_throttled), интервал которого истек, выполняется здесь же -
+    его ключи читаются тем же get_many.
+    """
+    cache = shared_cache()
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many([*keys, *map(_throttle_key, tags), *map(_dirty_key, tags)])
+    for tag in tags:
+        interval = found.get(_dirty_key(tag))
+        if interval and _throttle_key(tag) not in found and cache.add(_throttle_key(tag), True, timeout=interval):
+            # Флаг снимается до сброса: изменение, пришедшее между ними,
+            # снова поставит его и будет сброшено следующим интервалом
+            cache.delete(_dirty_key(tag))
+            found[_tag_key(tag)] = invalidate_tags(tag)
+    for key in keys.keys() - found.keys():
+        # Версия - время в наносекундах, а не счетчик: если ключ тега
+        # вытеснят из кеша, новая версия не совпадет ни с одной старой
+        cache.add(key, time.time_ns(), timeout=None)
+        found[key] = cache.get(key)
+    return {tag: found[key] for key, tag in keys.items()}
+
+
+def invalidate_tags(*tags):
+    """Сбрасывает все записи, помеченные хотя бы одним из тегов; возвращает новую версию"""
+    version = time.time_ns()
+    shared_cache().set_many({_tag_key(tag): version for tag in tags}, timeout=None)
+    return version
+
+
+def invalidate_throttled(tag, interval):
+    """
+    Сброс тега не чаще раза в interval секунд. Первое изменение сбрасывает
+    тег сразу; следующие в течение interval только помечают его, и сброс
+    делает первое чтение версии тега после конца интервала. Записи с тегом
+    устаревают не больше чем на interval секунд.
+    """
+    cache = shared_cache()
+    if cache.add(_throttle_key(tag), True, timeout=interval):
+        invalidate_tags(tag)
+    else:
+        cache.set(_dirty_key(tag), interval, timeout=None)
+
+
+def invalidate_on_commit(*tags):
+    """
+    Сброс после фиксации транзакции: иначе параллельный запрос может успеть
+    закешировать старые данные под новой версией тега.
+    """
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+def make_key(kind, name, tags, vary_on=()):
+    versions = sorted(tag_versions(tags).items())
+    digest = hashlib.md5(repr((name, tuple(vary_on), versions)).encode()).hexdigest()
+    return f'{KEY_PREFIX}:{kind}:{digest}'
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+        if sum(_stats.values()) < STATS_FLUSH_EVERY:
+            return
+        pending = dict(_stats)
+        _stats.clear()
+    _flush_stats(pending)
+
+
+def _flush_stats(pending):
+    cache = shared_cache()
+    for event, count in pending.items():
+        key = f'{KEY_PREFIX}:stats:{event}'
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            # Ключ успели вытеснить между add и incr
+            cache.set(key, count, timeout=None)
+
+
+def get_stats():
+    """Счетчики попаданий и промахов всех процессов (и еще не сброшенные этого)"""
+    stored = shared_cache().get_many([f'{KEY_PREFIX}:stats:{event}' for event in STATS_KEYS])
+    with _stats_lock:
+        local = dict(_stats)
+    return {
+        event: stored.get(f'{KEY_PREFIX}:stats:{event}', 0) + local.get(event, 0)
+        for event in STATS_KEYS
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+    shared_cache().delete_many([f'{KEY_PREFIX}:stats:{event}' for event in STATS_KEYS])
+
+
+def cache_get(key):
+    value = local_cache.get(key)
+    if value is not None:
+        _count('local_hits')
+        return value
+    value = shared_cache().get(key)
+    if value is not None:
+        _count('shared_hits')
+        local_cache.set(key, value, default_timeout())
+        return value
+    _count('misses')
+    return None
+
+
+def cache_get_many(keys):
+    """cache_get для нескольких ключей: промахи кеша процесса - одним get_many"""
+    found = {}
+    missing = []
+    for key in keys:
+        value = local_cache.get(key)
+        if value is None:
+            missing.append(key)
+        else:
+            _count('local_hits')
+            found[key] = value
+    if missing:
+        shared = shared_cache().get_many(missing)
+        for key, value in shared.items():
+            _count('shared_hits')
+            local_cache.set(key, value, default_timeout())
+        for _ in range(len(missing) - len(shared)):
+            _count('misses')
+        found.update(shared)
+    return found
+
+
+def cache_set(key, value, timeout=None):
+    timeout = default_timeout() if timeout is None else timeout
+    shared_cache().set(key, value, timeout)
+    local_cache.set(key, value, timeout)
+
+
+def get_or_set(kind, name, tags, build, vary_on=(), timeout=None):
+    """Значение из кеша или результат build(), который сохраняется в кеш"""
+    key = make_key(kind, name, tags, vary_on)
+    value = cache_get(key)
+    if value is None:
+        value = build()
+        cache_set(key, value, timeout)
+    return value
+
+
+def _is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Страница с непоказанными сообщениями не должна попасть к другим
+    return not len(get_messages(request))
+
+
+def _is_cacheable_response(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    # В странице есть CSRF-токен конкретного посетителя
+    return not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+
+
+def cache_page_by_tags(*tags, timeout=None):
+    """
+    Кеширует страницу для анонимных посетителей до изменения моделей tags.
+
+    Для классов-представлений: method_decorator(cache_page_by_tags(...), name='dispatch').
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            key = make_key('page', request.get_full_path(), tags)
+            cached = cache_get(key)
+            if cached is not None:
+                response = HttpResponse(cached['content'])
+                for header, value in cached['headers']:
+                    response[header] = value
+                patch_vary_headers(response, ('Cookie',))
+                response['X-Cache'] = 'HIT'
+                return response
+
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            if _is_cacheable_response(request, response):
+                # Заголовки сохраняем вместе с содержимым, как
+                # UpdateCacheMiddleware; Vary: Cookie - версия страницы
+                # только для анонимных посетителей
+                patch_vary_headers(response, ('Cookie',))
+                cache_set(key, {
+                    'content': response.content,
+                    'headers': list(response.items()),
+                }, timeout)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,107 @@
+"""
+Витрина карточек питомцев (модель PetCard).
+
+Строка витрины собирается из питомца, его типа и приюта; счетчики
+копируются из Pet (см. game.counters). Сигналы (game.signals) обновляют
+витрину точечно в той же транзакции, что и исходные данные, а команда
+rebuild_pet_cards пересобирает ее целиком.
+"""
+from .counters import popularity
+from .filters import age_bucket
+from .images import derivative_name
+from .models import Pet, PetCard
+from .templatetags.pet_filters import format_character
+
+
+THUMBNAIL_WIDTH = 320
+
+# Поля, которые перезаписываются при обновлении карточки
+CARD_FIELDS = [
+    'name', 'pet_type', 'pet_type_name', 'shelter', 'shelter_name', 'age', 'age_bucket',
+    'age_display', 'photo', 'photo_width', 'photo_height', 'photo_placeholder',
+    'thumbnail_url', 'character_excerpt', 'has_special_needs', 'favorites_count',
+    'comments_count', 'applications_count', 'sponsorship_total', 'popularity',
+    'is_adopted', 'date_added', 'updated_at',
+]
+
+
+def card_queryset():
+    """Питомцы со всем, что нужно для карточки, одним запросом"""
+    return Pet.objects.select_related('pet_type', 'shelter').order_by('pk')
+
+
+def thumbnail_url(photo):
+    if not photo:
+        return ''
+    return photo.storage.url(derivative_name(photo.name, THUMBNAIL_WIDTH, 'webp'))
+
+
+def build_card(pet):
+    """Несохраненная карточка для питомца из card_queryset()"""
+    return PetCard(
+        id=pet.pk,
+        name=pet.name,
+        pet_type=pet.pet_type,
+        pet_type_name=pet.pet_type.name,
+        shelter=pet.shelter,
+        shelter_name=pet.shelter.name,
+        age=pet.age,
+        age_bucket=age_bucket(pet.age),
+        age_display=pet.age_in_years,
+        photo=pet.photo.name,
+        photo_width=pet.photo_width,
+        photo_height=pet.photo_height,
+        photo_placeholder=pet.photo_placeholder,
+        thumbnail_url=thumbnail_url(pet.photo),
+        character_excerpt=format_character(pet.character),
+        has_special_needs=bool(pet.special_needs),
+        favorites_count=pet.favorites_count,
+        comments_count=pet.comments_count,
+        applications_count=pet.applications_count,
+        sponsorship_total=pet.sponsorship_total,
+        popularity=popularity(pet),
+        is_adopted=pet.is_adopted,
+        date_added=pet.date_added,
+        updated_at=pet.updated_at,
+    )
+
+
+def save_cards(cards):
+    PetCard.objects.bulk_create(
+        cards, update_conflicts=True, unique_fields=['id'], update_fields=CARD_FIELDS
+    )
+
+
+def sync_pet_cards(pet_ids):
+    """Пересобирает карточки питомцев pet_ids; карточки удаленных питомцев удаляются"""
+    pet_ids = set(pet_ids)
+    pets = list(card_queryset().filter(pk__in=pet_ids))
+    save_cards([build_card(pet) for pet in pets])
+    missing = pet_ids - {pet.pk for pet in pets}
+    if missing:
+        PetCard.objects.filter(pk__in=missing).delete()
+
+
+def rebuild_pet_cards(batch_size=500):
+    """Полная пересборка витрины; возвращает количество карточек"""
+    total = 0
+    last_pk = 0
+    while True:
+        pets = list(card_queryset().filter(pk__gt=last_pk)[:batch_size])
+        if not pets:
+            break
+        last_pk = pets[-1].pk
+        save_cards([build_card(pet) for pet in pets])
+        total += len(pets)
+    PetCard.objects.exclude(pk__in=Pet.objects.values('pk')).delete()
+    return total
+
+
+def ensure_pet_cards(using='default', **kwargs):
+    """
+    Заполняет пустую витрину после migrate (обработчик post_migrate), чтобы
+    каталог не оказался пустым сразу после появления таблицы.
+    """
+    if PetCard.objects.using(using).exists() or not Pet.objects.using(using).exists():
+        return
+    rebuild_pet_cards()
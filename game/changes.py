@@ -0,0 +1,109 @@
+"""
+Журнал изменений (модель ChangeLog) для инкрементальной синхронизации
+партнеров через /api/changes/.
+
+Записи добавляются сигналами (game.signals) в той же транзакции, что и само
+изменение, поэтому откат транзакции откатывает и запись журнала. Клиент
+запоминает последний полученный номер (seq) и в следующий раз запрашивает
+только то, что появилось после него.
+
+Номером не может служить id: параллельные транзакции фиксируются не в
+порядке id, и запись с меньшим id может стать видна уже после того, как
+клиент забрал запись с большим, - такую запись он бы пропустил. Поэтому seq
+выдается после фиксации (assign_sequence), по одной нумерации за раз: записи
+становятся видны ленте строго в порядке номеров.
+
+В журнал попадают только объекты, видимые через API: снятая с публикации
+история для партнера выглядит удаленной.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max, Min
+
+from .models import ChangeLog, HappyStory, Pet
+
+
+OBJECT_TYPES = {
+    Pet: 'pet',
+    HappyStory: 'happy_story',
+}
+
+# Ключ advisory-блокировки PostgreSQL, под которой выдаются номера
+SEQUENCE_LOCK_ID = 0x6368616e6765
+
+
+def log_change(model, object_id, action):
+    ChangeLog.objects.create(object_type=OBJECT_TYPES[model], object_id=object_id, action=action)
+    transaction.on_commit(assign_sequence)
+
+
+def log_changes(model, object_ids, action):
+    created = ChangeLog.objects.bulk_create([
+        ChangeLog(object_type=OBJECT_TYPES[model], object_id=object_id, action=action)
+        for object_id in object_ids
+    ])
+    if created:
+        transaction.on_commit(assign_sequence)
+
+
+def assign_sequence():
+    """
+    Нумерует зафиксированные записи без seq в порядке id.
+
+    Вызывается после фиксации транзакции, которая писала в журнал, и перед
+    чтением ленты - на случай, если процесс упал между фиксацией и
+    нумерацией. На PostgreSQL нумерации идут по очереди под advisory-
+    блокировкой до конца транзакции; на других базах параллельная нумерация
+    упрется в уникальность seq, и оставшиеся записи пронумерует следующий
+    вызов.
+    """
+    if not ChangeLog.objects.filter(seq__isnull=True).exists():
+        return
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SEQUENCE_LOCK_ID])
+            pending = list(ChangeLog.objects.filter(seq__isnull=True).order_by('id').only('id'))
+            last = ChangeLog.objects.aggregate(last=Max('seq'))['last'] or 0
+            for number, entry in enumerate(pending, start=last + 1):
+                entry.seq = number
+            ChangeLog.objects.bulk_update(pending, ['seq'], batch_size=500)
+    except IntegrityError:
+        pass
+
+
+def changes_since(since, limit, object_type=None):
+    """Записи журнала с номером больше since (не больше limit + 1 штуки)"""
+    queryset = ChangeLog.objects.filter(seq__gt=since)
+    if object_type:
+        queryset = queryset.filter(object_type=object_type)
+    return list(queryset.order_by('seq')[:limit + 1])
+
+
+def is_pruned(since):
+    """
+    Удалены ли из журнала записи после since (см. prune_change_log) -
+    тогда клиенту нужна полная повторная синхронизация. Номер, которого
+    журнал еще не выдавал (или пустой журнал), тоже требует ее: клиент
+    синхронизировался с другой базой или с журналом до очистки вручную.
+    """
+    if since == 0:
+        return False
+    bounds = ChangeLog.objects.filter(seq__isnull=False).aggregate(oldest=Min('seq'), newest=Max('seq'))
+    if bounds['newest'] is None or since > bounds['newest']:
+        return True
+    return since + 1 < bounds['oldest']
+
+
+def prune(before):
+    """
+    Удаляет пронумерованные записи старше даты before; возвращает их
+    количество. Последняя запись остается всегда: от нее assign_sequence
+    продолжает нумерацию, и номера уже выданные клиентам не повторяются.
+    """
+    queryset = ChangeLog.objects.filter(date_created__lt=before, seq__isnull=False)
+    newest = ChangeLog.objects.filter(seq__isnull=False).order_by('-seq').values_list('pk', flat=True).first()
+    if newest is not None:
+        queryset = queryset.exclude(pk=newest)
+    deleted, _ = queryset.delete()
+    return deleted
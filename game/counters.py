@@ -0,0 +1,130 @@
+"""
+Счетчики интереса к питомцу: избранное, одобренные комментарии, заявки и
+сумма активного опекунства.
+
+Счетчики хранятся в Pet и копируются в витрину PetCard вместе с
+популярностью - взвешенной суммой, по которой каталог сортирует "Сначала
+популярные". Сигналы (game.signals) меняют их на разницу через F(), без
+пересчета COUNT(*) и без гонок между параллельными запросами. Если счетчики
+все же разошлись с данными (массовые операции в обход сигналов, ручные
+правки в базе), их исправляет команда reconcile_pet_counters.
+
+update() не вызывает сигналы, поэтому кеш страниц, зависящих от счетчиков
+(сортировка по популярности, фильтр по интересу), сбрасывается отдельным
+тегом COUNTERS_TAG - не чаще раза в COUNTERS_CACHE_INTERVAL секунд (по
+умолчанию 30): на столько каталог может отставать от счетчиков.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .cache import invalidate_tags, invalidate_throttled
+from .models import AdoptionApplication, Comment, Favorite, Pet, PetCard, Sponsorship
+
+
+COUNTERS_TAG = 'game.counters'
+
+
+# Вклад счетчиков в популярность; деньги опекунства не учитываются, чтобы
+# одно крупное пожертвование не поднимало питомца выше всех
+POPULARITY_WEIGHTS = {
+    'favorites_count': 2,
+    'comments_count': 1,
+    'applications_count': 5,
+}
+
+
+def popularity(values):
+    """Популярность по значениям счетчиков (словарь или объект с атрибутами)"""
+    get = values.get if isinstance(values, dict) else lambda name: getattr(values, name)
+    return sum(weight * get(name) for name, weight in POPULARITY_WEIGHTS.items())
+
+
+def _shifted(name, delta):
+    expression = F(name) + delta
+    if delta < 0:
+        # Счетчик не уходит в минус, даже если уже разошелся с данными
+        expression = Greatest(expression, Value(type(delta)(0)))
+    return expression
+
+
+def change_counters(pet_id, **deltas):
+    """Меняет счетчики питомца и его карточки на deltas (например, favorites_count=1)"""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    values = {name: _shifted(name, delta) for name, delta in deltas.items()}
+    Pet.objects.filter(pk=pet_id).update(**values)
+    popularity_delta = popularity({name: deltas.get(name, 0) for name in POPULARITY_WEIGHTS})
+    if popularity_delta:
+        values['popularity'] = _shifted('popularity', popularity_delta)
+    PetCard.objects.filter(pk=pet_id).update(**values)
+    transaction.on_commit(invalidate_counters)
+
+
+def invalidate_counters():
+    invalidate_throttled(COUNTERS_TAG, getattr(settings, 'COUNTERS_CACHE_INTERVAL', 30))
+
+
+def _count(queryset):
+    return Coalesce(Subquery(
+        queryset.filter(pet=OuterRef('pk')).order_by().values('pet')
+        .annotate(count=Count('id')).values('count')
+    ), 0)
+
+
+def actual_counters():
+    """Аннотации с настоящими значениями счетчиков, посчитанными по таблицам"""
+    return {
+        'actual_favorites_count': _count(Favorite.objects.all()),
+        'actual_comments_count': _count(Comment.objects.filter(is_approved=True)),
+        'actual_applications_count': _count(AdoptionApplication.objects.all()),
+        'actual_sponsorship_total': Coalesce(Subquery(
+            Sponsorship.objects.filter(pet=OuterRef('pk'), is_active=True).order_by().values('pet')
+            .annotate(total=Sum('amount')).values('total')
+        ), Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    }
+
+
+def reconcile_counters(batch_size=500):
+    """
+    Сверяет счетчики питомцев и карточек с таблицами и исправляет
+    расхождения; возвращает id питомцев, у которых что-то исправлено.
+    """
+    from .cards import sync_pet_cards
+
+    fixed = []
+    last_pk = 0
+    card_fields = Pet.COUNTER_FIELDS + ('popularity',)
+    while True:
+        pets = list(
+            Pet.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', *Pet.COUNTER_FIELDS).annotate(**actual_counters())[:batch_size]
+        )
+        if not pets:
+            break
+        last_pk = pets[-1].pk
+        cards = {
+            row['id']: row
+            for row in PetCard.objects.filter(pk__in=[pet.pk for pet in pets]).values('id', *card_fields)
+        }
+        stale_cards = []
+        for pet in pets:
+            actual = {name: getattr(pet, f'actual_{name}') for name in Pet.COUNTER_FIELDS}
+            if any(getattr(pet, name) != value for name, value in actual.items()):
+                Pet.objects.filter(pk=pet.pk).update(**actual)
+                fixed.append(pet.pk)
+            card = cards.get(pet.pk)
+            expected = dict(actual, popularity=popularity(actual))
+            if card is not None and any(card[name] != value for name, value in expected.items()):
+                stale_cards.append(pet.pk)
+                if pet.pk not in fixed:
+                    fixed.append(pet.pk)
+        if stale_cards:
+            sync_pet_cards(stale_cards)
+    if fixed:
+        invalidate_tags(COUNTERS_TAG)
+    return fixed
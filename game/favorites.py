@@ -0,0 +1,85 @@
+"""
+Кеш избранного пользователя: множество id питомцев в общем кеше.
+
+Страницы со списками карточек проверяют "в избранном ли питомец" для каждой
+карточки; вместо выборки всего избранного на каждый запрос множество берется
+из кеша, а в шаблон попадает только его пересечение с питомцами страницы.
+Запись удаляется при добавлении и удалении избранного (сигналы в
+game.signals), поэтому срок жизни у нее большой.
+
+Здесь же изменение избранного без гонок: повторный клик или параллельные
+запросы не приводят к IntegrityError и не сбивают счетчик в витрине.
+"""
+from django.db import IntegrityError, transaction
+
+from .cache import KEY_PREFIX, shared_cache
+from .models import Favorite, PetCard
+
+
+FAVORITES_TIMEOUT = 24 * 60 * 60
+
+
+def favorites_key(user_id):
+    return f'{KEY_PREFIX}:favorites:{user_id}'
+
+
+def favorite_pet_ids(user):
+    """Множество id избранных питомцев пользователя (пустое - для анонимного)"""
+    if not user.is_authenticated:
+        return frozenset()
+    key = favorites_key(user.pk)
+    ids = shared_cache().get(key)
+    if ids is None:
+        ids = frozenset(Favorite.objects.filter(user=user).values_list('pet_id', flat=True))
+        shared_cache().set(key, ids, FAVORITES_TIMEOUT)
+    return ids
+
+
+def favorite_pet_ids_among(user, pet_ids):
+    """Какие из питомцев pet_ids в избранном у пользователя"""
+    return favorite_pet_ids(user) & set(pet_ids)
+
+
+def invalidate_favorites(user_id):
+    """Сброс после фиксации транзакции, иначе в кеш может вернуться старое множество"""
+    transaction.on_commit(lambda: shared_cache().delete(favorites_key(user_id)))
+
+
+def add_favorite(user, pet_id):
+    """
+    Добавляет питомца в избранное; возвращает, была ли добавлена запись.
+    Если такую же запись параллельно вставил другой запрос, вставка упирается
+    в unique_together и откатывается до точки сохранения.
+    """
+    try:
+        with transaction.atomic():
+            Favorite.objects.create(user=user, pet_id=pet_id)
+    except IntegrityError:
+        return False
+    return True
+
+
+def remove_favorite(user, pet_id):
+    """
+    Удаляет питомца из избранного; возвращает, была ли удалена запись.
+    Строка блокируется, поэтому при параллельном удалении сигнал (и уменьшение
+    счетчика) срабатывает только один раз.
+    """
+    with transaction.atomic():
+        favorite = Favorite.objects.select_for_update().filter(user=user, pet_id=pet_id).first()
+        if favorite is None:
+            return False
+        favorite.delete()
+    return True
+
+
+def set_favorite(user, pet_id, is_favorite):
+    """Приводит избранное к состоянию is_favorite; повторный вызов ничего не меняет"""
+    if is_favorite:
+        return add_favorite(user, pet_id)
+    return remove_favorite(user, pet_id)
+
+
+def favorites_counts(pet_ids):
+    """Число добавлений в избранное из витрины: {pet_id: count}"""
+    return dict(PetCard.objects.filter(pk__in=pet_ids).values_list('pk', 'favorites_count'))
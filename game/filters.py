@@ -0,0 +1,149 @@
+"""
+Фильтры, сортировка и фасеты каталога. Работают с витриной PetCard
+(см. game.cards): названия и возрастная группа в ней уже посчитаны.
+"""
+from django.db.models import Count, Q
+
+
+# Возрастные группы: (код, название, от месяцев включительно, до месяцев не включая)
+AGE_BUCKETS = [
+    ('baby', 'До 1 года', 0, 12),
+    ('young', '1–3 года', 12, 36),
+    ('adult', '3–8 лет', 36, 96),
+    ('senior', 'Старше 8 лет', 96, None),
+]
+
+# Варианты сортировки: код -> (название, порядок для пагинации по курсору)
+SORT_OPTIONS = {
+    'new': ('Сначала новые', ('-date_added', '-id')),
+    'old': ('Сначала давние', ('date_added', 'id')),
+    'young': ('Сначала молодые', ('age', 'id')),
+    'aged': ('Сначала старшие', ('-age', '-id')),
+    'name': ('По кличке', ('name', 'id')),
+    'popular': ('Сначала популярные', ('-popularity', '-id')),
+}
+DEFAULT_SORT = 'new'
+
+SPECIAL_NEEDS_CHOICES = [
+    ('', 'Не важно'),
+    ('yes', 'Есть особенности'),
+    ('no', 'Без особенностей'),
+]
+
+# Интерес к питомцу по популярности (см. game.counters)
+INTEREST_CHOICES = [
+    ('', 'Любой интерес'),
+    ('wanted', 'Уже присматриваются'),
+    ('unnoticed', 'Пока без внимания'),
+]
+
+
+def age_bucket(age):
+    """Код возрастной группы для возраста в месяцах"""
+    for code, label, age_from, age_to in AGE_BUCKETS:
+        if age >= age_from and (age_to is None or age < age_to):
+            return code
+    return AGE_BUCKETS[-1][0]
+
+
+def apply_base_filters(queryset, params):
+    """Фильтры, по которым не строятся фасеты"""
+    special_needs = params.get('special_needs')
+    if special_needs == 'yes':
+        queryset = queryset.filter(has_special_needs=True)
+    elif special_needs == 'no':
+        queryset = queryset.filter(has_special_needs=False)
+    interest = params.get('interest')
+    if interest == 'wanted':
+        queryset = queryset.filter(popularity__gt=0)
+    elif interest == 'unnoticed':
+        queryset = queryset.filter(popularity=0)
+    return queryset
+
+
+def facet_filters(params, exclude=None):
+    """Условие по фасетным параметрам (кроме exclude)"""
+    condition = Q()
+    if params.get('pet_type') and exclude != 'pet_type':
+        condition &= Q(pet_type_id=params['pet_type'])
+    if params.get('shelter') and exclude != 'shelter':
+        condition &= Q(shelter_id=params['shelter'])
+    if params.get('age') and exclude != 'age':
+        condition &= Q(age_bucket=params['age'])
+    return condition
+
+
+def filter_pets(queryset, params):
+    """Применяет все параметры каталога к queryset карточек питомцев"""
+    return apply_base_filters(queryset, params).filter(facet_filters(params))
+
+
+def facet_counts(queryset, params):
+    """
+    Счетчики фасетов одним запросом.
+
+    Выбирается одна сгруппированная таблица (тип, приют, возрастная группа)
+    -> количество, а счетчики каждого фасета считаются по ней в Python:
+    для фасета учитываются выбранные значения всех остальных фасетов,
+    но не его собственное, чтобы было видно, сколько будет при переключении.
+    """
+    rows = list(
+        apply_base_filters(queryset, params)
+        .values('pet_type_id', 'pet_type_name', 'shelter_id', 'shelter_name', 'age_bucket')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    selected = {
+        'pet_type': params.get('pet_type'),
+        'shelter': params.get('shelter'),
+        'age': params.get('age'),
+    }
+
+    def matches(row, exclude):
+        if exclude != 'pet_type' and selected['pet_type'] and row['pet_type_id'] != selected['pet_type']:
+            return False
+        if exclude != 'shelter' and selected['shelter'] and row['shelter_id'] != selected['shelter']:
+            return False
+        if exclude != 'age' and selected['age'] and row['age_bucket'] != selected['age']:
+            return False
+        return True
+
+    pet_types, shelters, ages = {}, {}, {code: 0 for code, *_ in AGE_BUCKETS}
+    labels = {}
+    total = 0
+    for row in rows:
+        labels[('pet_type', row['pet_type_id'])] = row['pet_type_name']
+        labels[('shelter', row['shelter_id'])] = row['shelter_name']
+        pet_types.setdefault(row['pet_type_id'], 0)
+        shelters.setdefault(row['shelter_id'], 0)
+        if matches(row, 'pet_type'):
+            pet_types[row['pet_type_id']] += row['count']
+        if matches(row, 'shelter'):
+            shelters[row['shelter_id']] += row['count']
+        if matches(row, 'age'):
+            ages[row['age_bucket']] += row['count']
+        if matches(row, None):
+            total += row['count']
+
+    def build(name, counts):
+        items = [
+            {
+                'value': value,
+                'label': labels[(name, value)],
+                'count': count,
+                'selected': value == selected[name],
+            }
+            for value, count in counts.items()
+        ]
+        return sorted(items, key=lambda item: item['label'])
+
+    return {
+        'pet_type': build('pet_type', pet_types),
+        'shelter': build('shelter', shelters),
+        'age': [
+            {'value': code, 'label': label, 'count': ages[code], 'selected': code == selected['age']}
+            for code, label, *_ in AGE_BUCKETS
+        ],
+        'total': total,
+    }
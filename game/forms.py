@@ -1,5 +1,6 @@
 from django import forms
 from .models import Comment, AdoptionApplication
+from .filters import AGE_BUCKETS, SORT_OPTIONS, DEFAULT_SORT, SPECIAL_NEEDS_CHOICES, INTEREST_CHOICES
 
 
 class CommentForm(forms.ModelForm):
@@ -70,4 +71,27 @@ class AdoptionApplicationForm(forms.ModelForm):
         # Делаем некоторые поля обязательными
         required_fields = ['full_name', 'phone', 'email', 'address', 'housing_type', 'experience', 'motivation']
         for field_name in required_fields:
-            self.fields[field_name].required = True
\ No newline at end of file
+            self.fields[field_name].required = True
+
+
+class PetFilterForm(forms.Form):
+    """Параметры фильтрации и сортировки каталога питомцев"""
+    pet_type = forms.IntegerField(required=False, min_value=1)
+    shelter = forms.IntegerField(required=False, min_value=1)
+    age = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Любой возраст')] + [(code, label) for code, label, *_ in AGE_BUCKETS]
+    )
+    special_needs = forms.ChoiceField(required=False, choices=SPECIAL_NEEDS_CHOICES)
+    interest = forms.ChoiceField(required=False, choices=INTEREST_CHOICES)
+    sort = forms.ChoiceField(
+        required=False,
+        choices=[(code, label) for code, (label, ordering) in SORT_OPTIONS.items()]
+    )
+    
+    def get_params(self):
+        """Корректные параметры фильтра (ошибочные просто игнорируются)"""
+        self.is_valid()
+        params = {name: value for name, value in self.cleaned_data.items() if value}
+        params.setdefault('sort', DEFAULT_SORT)
+        return params
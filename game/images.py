@@ -0,0 +1,183 @@
+"""
+Уменьшенные копии фотографий для адаптивной выдачи (srcset).
+
+Для каждого оригинала рядом с ним сохраняются копии нескольких ширин в
+WebP и JPEG: "pets/Барсик.jpg" -> "pets/Барсик_320w.webp", "pets/Барсик_320w.jpg"
+и т.д. Перед уменьшением применяется EXIF-ориентация, метаданные не
+переносятся. Функции работают с путями на диске и не используют настройки
+и базу Django, поэтому их можно вызывать из пула процессов.
+"""
+import base64
+import io
+import os
+import re
+
+from PIL import Image, ImageOps
+
+from .storage import content_name, is_content_addressed, path_digest
+
+
+DERIVATIVE_WIDTHS = (320, 640, 960)
+
+# Оригиналы больше этого размера по длинной стороне уменьшаются при обработке
+MAX_ORIGINAL_SIDE = 2560
+
+# Расширение файла -> (формат Pillow, параметры сохранения)
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+DERIVATIVE_RE = re.compile(r'_\d+w\.(webp|jpg)$')
+
+# Размер превью-заглушки (LQIP), которая встраивается прямо в HTML
+PLACEHOLDER_SIZE = 16
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.jfif', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff')
+
+
+def derivative_name(name, width, extension):
+    """Имя уменьшенной копии для файла name (путь или имя в хранилище)"""
+    stem, _ = os.path.splitext(name)
+    return f'{stem}_{width}w.{extension}'
+
+
+def is_derivative(name):
+    return bool(DERIVATIVE_RE.search(name))
+
+
+def is_source_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS) and not is_derivative(name)
+
+
+def has_derivatives(path):
+    """Есть ли на диске полный набор копий для оригинала path"""
+    return all(
+        os.path.exists(derivative_name(path, width, extension))
+        for width in DERIVATIVE_WIDTHS
+        for extension in DERIVATIVE_FORMATS
+    )
+
+
+def _prepare(image):
+    """Поворот по EXIF и приведение к RGB (без прозрачности и метаданных)"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def build_derivatives(path, force=False):
+    """
+    Создает уменьшенные копии для файла path.
+
+    Копии шире оригинала не создаются увеличением - в них сохраняется
+    оригинальный размер. Возвращает список путей созданных файлов.
+    """
+    if not force and has_derivatives(path):
+        return []
+
+    with Image.open(path) as original:
+        image = _prepare(original)
+
+    created = []
+    for width in DERIVATIVE_WIDTHS:
+        resized = image.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+        for extension, (image_format, options) in DERIVATIVE_FORMATS.items():
+            target = derivative_name(path, width, extension)
+            tmp_target = f'{target}.tmp'
+            resized.save(tmp_target, image_format, **options)
+            os.replace(tmp_target, target)
+            created.append(target)
+    return created
+
+
+def normalize_original(path):
+    """
+    Приводит оригинал к разумному виду: поворот по EXIF, удаление метаданных,
+    уменьшение до MAX_ORIGINAL_SIDE. Формат сохраняется; файл переписывается,
+    только если что-то действительно нужно поменять.
+
+    Обычный файл перезаписывается под тем же именем. Файл из хранилища по
+    хешу (game.storage) менять нельзя - результат сохраняется под новым
+    хешем рядом, а старый остается для других ссылок на него.
+    Возвращает путь к итоговому файлу.
+    """
+    with Image.open(path) as original:
+        # Многокадровые JPEG с камер (MPO) сохраняем как обычный JPEG
+        image_format = 'JPEG' if original.format == 'MPO' else original.format
+        orientation = original.getexif().get(0x0112, 1)
+        too_large = max(original.size) > MAX_ORIGINAL_SIDE
+        if orientation == 1 and not too_large:
+            return path
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    image.thumbnail((MAX_ORIGINAL_SIDE, MAX_ORIGINAL_SIDE), Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = _prepare(image)
+    tmp_path = f'{path}.tmp'
+    options = {'quality': 90} if image_format in ('JPEG', 'WEBP') else {}
+    image.save(tmp_path, image_format, **options)
+
+    if is_content_addressed(path):
+        _, extension = os.path.splitext(path)
+        # path = <корень>/content/ab/cd/<хеш>.ext
+        root = path
+        for _ in range(4):
+            root = os.path.dirname(root)
+        new_path = os.path.join(root, *content_name(path_digest(tmp_path), extension).split('/'))
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        os.replace(tmp_path, new_path)
+        return new_path
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def image_metadata(path):
+    """
+    Размеры изображения (с учетом EXIF-поворота) и крошечное превью
+    в виде data URI для встраивания в страницу до загрузки самого фото.
+    """
+    with Image.open(path) as original:
+        width, height = original.size
+        if original.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            # Повернутое на 90 градусов фото
+            width, height = height, width
+        # Для JPEG декодируем сразу в уменьшенном виде - это намного быстрее
+        original.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+        image = _prepare(original)
+
+    image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.LANCZOS)
+    buffer = io.BytesIO()
+    # WebP в разы компактнее JPEG на таких размерах; если браузер его не
+    # поддерживает, просто не будет фона-заглушки
+    image.save(buffer, 'WEBP', quality=30)
+    placeholder = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode()
+    return {'path': path, 'width': width, 'height': height, 'placeholder': placeholder}
+
+
+def process_image(path):
+    """
+    Полная обработка загруженного файла: нормализация оригинала, копии и
+    метаданные для заглушки (см. image_metadata). Путь итогового файла
+    возвращается в metadata['path'] и может отличаться от исходного.
+    """
+    path = normalize_original(path)
+    build_derivatives(path, force=True)
+    return image_metadata(path)
+
+
+def remove_derivatives(path):
+    """Удаляет уменьшенные копии оригинала path"""
+    for width in DERIVATIVE_WIDTHS:
+        for extension in DERIVATIVE_FORMATS:
+            try:
+                os.remove(derivative_name(path, width, extension))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,195 @@
+"""
+Очередь фоновой обработки изображений в базе данных (модель ImageJob).
+
+Сохранение записи с фото только ставит задачу в очередь, а тяжелая работа
+(декодирование, уменьшение, перекодирование и копии для srcset) выполняется
+командой process_image_jobs в пуле процессов.
+"""
+import os
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import get_or_set, invalidate_on_commit, model_tag
+from .cards import sync_pet_cards
+from .changes import log_change
+from .models import ImageJob, Pet, PetCard, HappyStory
+
+
+# Модели и поля с фотографиями, которые проходят обработку
+IMAGE_FIELDS = [
+    (Pet, 'photo'),
+    (HappyStory, 'photo_after'),
+]
+
+# Сколько раз повторять задачу, прежде чем пометить ее как ошибочную
+MAX_ATTEMPTS = 3
+
+# Задачи в этих статусах еще могут создать копии изображения
+ACTIVE_STATUSES = ('pending', 'processing')
+
+# Поля, определяющие фото задачи: в очереди на фото одна задача
+JOB_KEY = ('content_type_id', 'object_id', 'field_name')
+
+
+def enqueue_image_job(instance, field_name):
+    """Ставит обработку поля field_name объекта instance в очередь (без дублей)"""
+    content_type = ContentType.objects.get_for_model(instance)
+    job, created = ImageJob.objects.get_or_create(
+        content_type=content_type,
+        object_id=instance.pk,
+        field_name=field_name,
+        status='pending',
+    )
+    return job
+
+
+def claim_jobs(limit):
+    """Атомарно забирает до limit задач из очереди и переводит их в обработку"""
+    with transaction.atomic():
+        ids = list(
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        ImageJob.objects.filter(id__in=ids, status='pending').update(
+            status='processing', date_started=timezone.now()
+        )
+        invalidate_jobs(ids)
+    return list(ImageJob.objects.filter(id__in=ids, status='processing').select_related('content_type'))
+
+
+def job_image(job):
+    """Файл изображения задачи (FieldFile) или None, если объекта/файла больше нет"""
+    instance = job.content_object
+    if instance is None:
+        return None
+    image = getattr(instance, job.field_name, None)
+    if not image:
+        return None
+    return image
+
+
+def store_image_metadata(model, pk, field_name, source_name, metadata):
+    """
+    Сохраняет результат обработки файла source_name: размеры и превью-заглушку
+    в поля <field_name>_width/_height/_placeholder и, если обработка дала
+    новый файл, его имя. Если фото за это время заменили, ничего не меняется.
+    Используется update(), чтобы не вызывать сигналы post_save повторно,
+    поэтому кеш страниц с этой моделью сбрасывается здесь.
+    """
+    storage = model._meta.get_field(field_name).storage
+    name = os.path.relpath(metadata['path'], storage.location).replace(os.sep, '/')
+    values = {
+        field_name: name,
+        f'{field_name}_width': metadata['width'],
+        f'{field_name}_height': metadata['height'],
+        f'{field_name}_placeholder': metadata['placeholder'],
+    }
+    if model is Pet:
+        # update() не трогает auto_now, а по updated_at кешируются карточки
+        values['updated_at'] = timezone.now()
+    updated = model.objects.filter(pk=pk, **{field_name: source_name}).update(**values)
+    if updated and (model is Pet or model.objects.filter(pk=pk, is_published=True).exists()):
+        log_change(model, pk, 'updated')
+    if updated and model is Pet:
+        sync_pet_cards([pk])
+    invalidate_on_commit(model_tag(model))
+
+
+def finish_job(job, error=None):
+    """Отмечает результат обработки; неудачные задачи повторяются до MAX_ATTEMPTS раз"""
+    job.attempts += 1
+    job.date_finished = timezone.now()
+    if error is None:
+        job.status = 'done'
+        job.error = ''
+    else:
+        # Если фото тем временем снова поставили в очередь, повтор сделает
+        # та задача (вторую в очередь на одно фото не ставим)
+        queued = ImageJob.objects.filter(
+            status='pending', **{name: getattr(job, name) for name in JOB_KEY}
+        ).exists()
+        job.status = 'pending' if job.attempts < MAX_ATTEMPTS and not queued else 'failed'
+        job.error = error
+    job.save(update_fields=['status', 'attempts', 'error', 'date_finished'])
+    if job.status == 'failed':
+        # Страницы с заглушкой "Фото обрабатывается" теперь покажут оригинал
+        invalidate_on_commit(model_tag(job.content_type.model_class()))
+
+
+def processing_images():
+    """
+    Изображения с незавершенной задачей: множество (id типа, id объекта, поле).
+    Кешируется до следующего сохранения задачи (сигналы game.signals сбрасывают
+    тег ImageJob), поэтому проверка в шаблоне не стоит запроса на каждое фото.
+    """
+    return get_or_set('image_jobs', 'active', [model_tag(ImageJob)], lambda: frozenset(
+        ImageJob.objects.filter(status__in=ACTIVE_STATUSES)
+        .values_list('content_type_id', 'object_id', 'field_name')
+    ))
+
+
+def is_processing(instance, field_name):
+    """Ждет ли фото field_name объекта instance обработки в очереди"""
+    # Карточка показывает фото питомца, задача поставлена на питомца
+    model = Pet if isinstance(instance, PetCard) else type(instance)
+    content_type = ContentType.objects.get_for_model(model)
+    return (content_type.pk, instance.pk, field_name) in processing_images()
+
+
+def requeue_jobs(queryset, **values):
+    """
+    Возвращает задачи queryset в очередь (с дополнительными значениями
+    полей values), по одной на фото: если на фото уже есть задача в очереди,
+    вторая не ставится. Возвращает (id поставленных, id пропущенных).
+    """
+    with transaction.atomic():
+        queued = set(ImageJob.objects.filter(status='pending').values_list(*JOB_KEY))
+        requeued, skipped = [], []
+        for job_id, *key in queryset.exclude(status='pending').order_by('-id').values_list('id', *JOB_KEY):
+            if tuple(key) in queued:
+                skipped.append(job_id)
+            else:
+                queued.add(tuple(key))
+                requeued.append(job_id)
+        ImageJob.objects.filter(id__in=requeued).update(status='pending', **values)
+        invalidate_jobs(requeued)
+    return requeued, skipped
+
+
+def requeue_stale_jobs(older_than):
+    """
+    Возвращает в очередь задачи, "зависшие" в обработке (упавший воркер).
+    Если фото тем временем снова поставлено в очередь, зависшая задача
+    помечается ошибочной - обработку сделает задача из очереди.
+    """
+    stale = ImageJob.objects.filter(status='processing', date_started__lt=timezone.now() - older_than)
+    requeued, skipped = requeue_jobs(stale)
+    ImageJob.objects.filter(id__in=skipped).update(
+        status='failed', error='Фото заново поставлено в очередь', date_finished=timezone.now()
+    )
+    invalidate_jobs(skipped)
+    return len(requeued)
+
+
+def invalidate_jobs(job_ids):
+    """
+    update() не вызывает сигналы, поэтому после смены статуса задач job_ids
+    сбрасываются тег ImageJob (множество processing_images) и страницы с
+    моделями их фото - заглушка "Фото обрабатывается" появляется или исчезает.
+    """
+    if not job_ids:
+        return
+    content_type_ids = ImageJob.objects.filter(id__in=job_ids).values_list('content_type_id', flat=True).distinct()
+    invalidate_on_commit(model_tag(ImageJob), *(
+        model_tag(ContentType.objects.get_for_id(content_type_id).model_class())
+        for content_type_id in content_type_ids
+    ))
+
+
+def is_async():
+    return getattr(settings, 'IMAGE_PROCESSING_ASYNC', True)
@@ -0,0 +1,222 @@
+"""
+Нагрузочный прогон сайта без внешних инструментов: несколько потоков
+выполняют запросы тестовым клиентом Django прямо через URLconf (без
+веб-сервера), выбирая маршруты по весам TRAFFIC_MIX - примерно так
+распределяются запросы на живом сайте. Для каждого маршрута считаются
+время ответа (p50/p95/p99) и ошибки, для всего прогона - пропускная
+способность.
+
+Работает с текущей базой, поэтому запускать стоит на синтетических данных
+(команда generate_synthetic_data): запросы на запись действительно меняют
+избранное и добавляют комментарии. Вошедшие посетители - синтетические
+пользователи.
+"""
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from itertools import count
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from .filters import AGE_BUCKETS, SORT_OPTIONS
+from .models import HappyStory, Pet, PetType
+from .synthetic import USERNAME_PREFIX
+
+
+SEARCH_QUERIES = ['ласковый', 'кошка', 'любит детей', 'собака приучен', 'диета', 'спокойный кролик']
+
+# Сколько id питомцев, историй и пользователей берется в выборку для адресов
+SAMPLE_SIZE = 2000
+
+
+def catalog_query(sample, rng):
+    params = [f'sort={rng.choice(list(SORT_OPTIONS))}']
+    if rng.random() < 0.3:
+        params.append(f'pet_type={rng.choice(sample["pet_types"])}')
+    if rng.random() < 0.2:
+        params.append(f'age={rng.choice(AGE_BUCKETS)[0]}')
+    return '?' + '&'.join(params)
+
+
+def pet_id(sample, rng):
+    # Популярных питомцев открывают чаще остальных
+    return sample['pets'][int(len(sample['pets']) * rng.random() ** 2)]
+
+
+# Маршрут: (вес, нужен вход, меняет данные, (выборка, rng) -> (метод, адрес, данные))
+TRAFFIC_MIX = {
+    'pet_list': (25, False, False, lambda s, rng: ('get', reverse('pet_list') + catalog_query(s, rng), None)),
+    'pet_list_batch': (8, False, False, lambda s, rng: (
+        'get', reverse('pet_list_batch') + catalog_query(s, rng), None)),
+    'pet_detail': (25, False, False, lambda s, rng: ('get', reverse('pet_detail', args=[pet_id(s, rng)]), None)),
+    'pet_comments': (4, False, False, lambda s, rng: (
+        'get', reverse('pet_comments', args=[pet_id(s, rng)]), None)),
+    'pet_search': (6, False, False, lambda s, rng: (
+        'get', reverse('pet_search') + f'?q={rng.choice(SEARCH_QUERIES)}', None)),
+    'compare_pets': (2, False, False, lambda s, rng: (
+        'get', reverse('compare_pets') + '?' + '&'.join(f'pets={pet_id(s, rng)}' for _ in range(3)), None)),
+    'happy_stories': (3, False, False, lambda s, rng: ('get', reverse('happy_stories'), None)),
+    'happy_story_detail': (2, False, False, lambda s, rng: (
+        'get', reverse('happy_story_detail', args=[rng.choice(s['stories'])]), None)),
+    'faq': (2, False, False, lambda s, rng: ('get', reverse('faq'), None)),
+    'help_info': (2, False, False, lambda s, rng: ('get', reverse('help_info'), None)),
+    'favorites': (4, True, False, lambda s, rng: ('get', reverse('favorites'), None)),
+    'my_applications': (2, True, False, lambda s, rng: ('get', reverse('my_applications'), None)),
+    'sponsor_pet': (1, True, False, lambda s, rng: ('get', reverse('sponsor_pet', args=[pet_id(s, rng)]), None)),
+    'toggle_favorite_ajax': (5, True, True, lambda s, rng: (
+        'post', reverse('toggle_favorite_ajax', args=[pet_id(s, rng)]), json.dumps({'is_favorite': rng.random() < 0.7}))),
+    'add_comment': (1, True, True, lambda s, rng: (
+        'post', reverse('add_comment', args=[pet_id(s, rng)]), {'content': 'Нагрузочный комментарий'})),
+    'api_pet_list': (3, False, False, lambda s, rng: ('get', reverse('api_pet_list') + catalog_query(s, rng), None)),
+    'api_pet_detail': (2, False, False, lambda s, rng: (
+        'get', reverse('api_pet_detail', args=[pet_id(s, rng)]), None)),
+    'api_changes': (1, False, False, lambda s, rng: ('get', reverse('api_changes'), None)),
+}
+
+
+def load_sample():
+    """id питомцев, историй, типов и пользователей, из которых строятся адреса"""
+    return {
+        # Сначала популярные: pet_id чаще выбирает начало списка
+        'pets': list(
+            Pet.objects.filter(is_adopted=False).order_by('-favorites_count', 'pk')
+            .values_list('pk', flat=True)[:SAMPLE_SIZE]
+        ),
+        'stories': list(HappyStory.objects.filter(is_published=True).values_list('pk', flat=True)[:SAMPLE_SIZE]),
+        'pet_types': list(PetType.objects.values_list('pk', flat=True)),
+        'users': list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('pk', flat=True)[:SAMPLE_SIZE]
+        ),
+    }
+
+
+def percentile(durations, share):
+    """Перцентиль по рангу для отсортированного списка"""
+    if not durations:
+        return 0.0
+    return durations[max(0, math.ceil(share * len(durations)) - 1)]
+
+
+def client_host():
+    """Хост, который пропустит ALLOWED_HOSTS"""
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')
+        if host and host != '*':
+            return host
+    return 'localhost'
+
+
+class LoadTest:
+    """
+    Прогон total запросов в concurrency потоков (или в течение duration
+    секунд, если задано). read_only исключает маршруты, меняющие данные.
+    """
+
+    def __init__(self, total=1000, concurrency=8, duration=None, read_only=False, seed=None):
+        self.total = total
+        self.concurrency = concurrency
+        self.duration = duration
+        self.seed = seed
+        self.mix = {
+            name: route for name, route in TRAFFIC_MIX.items() if not (read_only and route[2])
+        }
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def run(self):
+        self.sample = load_sample()
+        if not self.sample['pets']:
+            raise ValueError('В базе нет питомцев, ищущих дом: сначала запустите generate_synthetic_data')
+        # Без синтетических пользователей и историй эти маршруты не проверить
+        self.mix = {
+            name: route for name, route in self.mix.items()
+            if (self.sample['users'] or not route[1])
+            and (self.sample['stories'] or name != 'happy_story_detail')
+        }
+        self.counter = count()
+        self.deadline = time.monotonic() + self.duration if self.duration else None
+        threads = [
+            threading.Thread(target=self.worker, args=(index,)) for index in range(self.concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - started
+        return self.report()
+
+    def next_request(self):
+        if self.deadline is not None:
+            return time.monotonic() < self.deadline
+        return next(self.counter) < self.total
+
+    def worker(self, index):
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        names = list(self.mix)
+        weights = [self.mix[name][0] for name in names]
+        host = client_host()
+        anonymous = Client(HTTP_HOST=host, raise_request_exception=False)
+        visitor = Client(HTTP_HOST=host, raise_request_exception=False)
+        if self.sample['users']:
+            visitor.force_login(User.objects.get(pk=rng.choice(self.sample['users'])))
+        timings = defaultdict(list)
+        errors = defaultdict(int)
+        try:
+            while self.next_request():
+                name = rng.choices(names, weights)[0]
+                weight, login, writes, build = self.mix[name]
+                method, url, data = build(self.sample, rng)
+                client = visitor if login else anonymous
+                kwargs = {'content_type': 'application/json'} if isinstance(data, str) else {}
+                started = time.perf_counter()
+                try:
+                    response = getattr(client, method)(url, data, **kwargs)
+                    failed = response.status_code >= 500
+                except Exception:
+                    failed = True
+                timings[name].append(time.perf_counter() - started)
+                if failed:
+                    errors[name] += 1
+        finally:
+            # У каждого потока свое соединение с базой
+            connections.close_all()
+        with self.lock:
+            for name, durations in timings.items():
+                self.timings[name].extend(durations)
+            for name, number in errors.items():
+                self.errors[name] += number
+
+    def report(self):
+        """
+        {'requests', 'errors', 'elapsed', 'throughput', 'routes': [{'name',
+        'requests', 'errors', 'p50', 'p95', 'p99', 'max'}]} - время в мс
+        """
+        routes = []
+        for name, durations in sorted(self.timings.items(), key=lambda item: -len(item[1])):
+            durations.sort()
+            routes.append({
+                'name': name,
+                'requests': len(durations),
+                'errors': self.errors[name],
+                'p50': percentile(durations, 0.50) * 1000,
+                'p95': percentile(durations, 0.95) * 1000,
+                'p99': percentile(durations, 0.99) * 1000,
+                'max': durations[-1] * 1000,
+            })
+        total = sum(route['requests'] for route in routes)
+        return {
+            'requests': total,
+            'errors': sum(self.errors.values()),
+            'elapsed': self.elapsed,
+            'throughput': total / self.elapsed if self.elapsed else 0.0,
+            'routes': routes,
+        }
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from game.similarity import build_content_similarity
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожих питомцев по описанию (характер, история, особенности, тип, возраст). '
+        'По умолчанию - только измененных питомцев; полный расчет обновляет и веса слов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать всех питомцев')
+
+    def handle(self, *args, **options):
+        pets, neighbors = build_content_similarity(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано питомцев: {pets}, сохранено соседей: {neighbors}'))
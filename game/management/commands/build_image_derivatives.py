@@ -0,0 +1,41 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from game.images import build_derivatives, is_source_image
+from game.storage import CONTENT_DIR
+
+
+MEDIA_DIRS = [CONTENT_DIR, 'pets', 'happy_stories']
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии (WebP/JPEG) для уже загруженных фотографий'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Количество процессов (по умолчанию - число ядер)')
+        parser.add_argument('--force', action='store_true',
+                            help='Пересоздать копии, даже если они уже есть')
+
+    def handle(self, *args, **options):
+        paths = []
+        for directory in MEDIA_DIRS:
+            root = os.path.join(settings.MEDIA_ROOT, directory)
+            for dirpath, dirnames, filenames in os.walk(root):
+                paths.extend(os.path.join(dirpath, name) for name in filenames if is_source_image(name))
+
+        self.stdout.write(f'Найдено оригиналов: {len(paths)}')
+        created = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(build_derivatives, path, options['force']): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    created += len(future.result())
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Создано файлов: {created}, ошибок: {failed}'))
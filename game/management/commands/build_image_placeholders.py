@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from game.images import image_metadata
+from game.jobs import IMAGE_FIELDS, store_image_metadata
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры и превью-заглушки для уже загруженных фотографий'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Количество процессов (по умолчанию - число ядер)')
+        parser.add_argument('--batch', type=int, default=500,
+                            help='Сколько записей обрабатывать за один проход')
+        parser.add_argument('--force', action='store_true',
+                            help='Пересчитать даже для записей, где превью уже есть')
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            for model, field_name in IMAGE_FIELDS:
+                updated, failed = self.backfill(executor, model, field_name, options)
+                self.stdout.write(self.style.SUCCESS(
+                    f'{model._meta.verbose_name_plural}: обновлено {updated}, ошибок {failed}'
+                ))
+
+    def backfill(self, executor, model, field_name, options):
+        queryset = model.objects.exclude(**{field_name: ''}).order_by('pk')
+        if not options['force']:
+            queryset = queryset.filter(**{f'{field_name}_placeholder': ''})
+
+        updated = failed = 0
+        last_pk = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).values_list('pk', field_name)[:options['batch']])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            storage = model._meta.get_field(field_name).storage
+            paths = [storage.path(name) for pk, name in rows]
+            results = executor.map(_safe_metadata, paths)
+            for (pk, name), path, metadata in zip(rows, paths, results):
+                if metadata is None:
+                    failed += 1
+                    self.stderr.write(f'Не удалось прочитать {path}')
+                    continue
+                store_image_metadata(model, pk, field_name, name, metadata)
+                updated += 1
+        return updated, failed
+
+
+def _safe_metadata(path):
+    try:
+        return image_metadata(path)
+    except OSError:
+        return None
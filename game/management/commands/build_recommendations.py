@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from game.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожих питомцев по избранному, заявкам и опекунству. '
+        'По умолчанию - только для питомцев с новыми взаимодействиями; '
+        'полный расчет (учитывает и удаления) стоит запускать, например, раз в сутки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать всех питомцев')
+
+    def handle(self, *args, **options):
+        pets, neighbors = build_recommendations(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано питомцев: {pets}, сохранено соседей: {neighbors}'))
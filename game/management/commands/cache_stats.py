@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from game.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кеша страниц и фрагментов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Обнулить счетчики после вывода')
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        hits = stats['local_hits'] + stats['shared_hits']
+        total = hits + stats['misses']
+        ratio = hits / total * 100 if total else 0
+        self.stdout.write(
+            f'Попаданий в кеш процесса: {stats["local_hits"]}, в общий кеш: {stats["shared_hits"]}, '
+            f'промахов: {stats["misses"]}'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Доля попаданий: {ratio:.1f}%'))
+        if options['reset']:
+            reset_stats()
+            self.stdout.write('Счетчики обнулены')
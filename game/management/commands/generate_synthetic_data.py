@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from game.synthetic import PASSWORD, USERNAME_PREFIX, SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает синтетические данные для проверки масштабирования: питомцев с фото-заглушками, '
+        'пользователей, избранное, комментарии, опекунство, заявки и счастливые истории. '
+        'Данные добавляются к существующим - запускать только на локальной или тестовой базе. '
+        'Пример масштаба продакшена: --pets 50000 --users 200000'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pets', type=int, default=1000, help='Сколько питомцев создать')
+        parser.add_argument('--users', type=int, default=4000, help='Сколько пользователей создать')
+        parser.add_argument('--shelters', type=int, default=20, help='Сколько приютов создать')
+        parser.add_argument('--favorites-per-user', type=float, default=8,
+                            help='Среднее число питомцев в избранном у пользователя')
+        parser.add_argument('--comments-per-pet', type=float, default=3,
+                            help='Среднее число комментариев у питомца')
+        parser.add_argument('--applications-per-user', type=float, default=0.3,
+                            help='Среднее число заявок на усыновление у пользователя')
+        parser.add_argument('--sponsorships-per-user', type=float, default=0.2,
+                            help='Среднее число опекунств у пользователя')
+        parser.add_argument('--adopted', type=float, default=0.15,
+                            help='Доля усыновленных питомцев (у каждого будет счастливая история)')
+        parser.add_argument('--images', type=int, default=12, help='Сколько разных фото-заглушек создать')
+        parser.add_argument('--batch', type=int, default=5000, help='Сколько строк вставлять за один запрос')
+        parser.add_argument('--seed', type=int, default=None, help='Зерно генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        generator = SyntheticDataGenerator(
+            batch_size=options['batch'], seed=options['seed'], log=self.stdout.write,
+        )
+        created = generator.generate(
+            pets=options['pets'],
+            users=options['users'],
+            shelters=options['shelters'],
+            favorites_per_user=options['favorites_per_user'],
+            comments_per_pet=options['comments_per_pet'],
+            applications_per_user=options['applications_per_user'],
+            sponsorships_per_user=options['sponsorships_per_user'],
+            adopted_share=options['adopted'],
+            images=options['images'],
+        )
+        summary = ', '.join(f'{label}: {number}' for label, number in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Создано - {summary}'))
+        self.stdout.write(
+            f'Пользователи {USERNAME_PREFIX}N, пароль "{PASSWORD}". Похожие питомцы считаются отдельно: '
+            'build_recommendations --full и build_content_similarity --full'
+        )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game.loadtest import LoadTest
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон: запросы по типичной смеси маршрутов в несколько потоков через URLconf, '
+        'отчет о пропускной способности и p50/p95/p99 по каждому маршруту. '
+        'Меняет данные (избранное, комментарии), если не указан --read-only'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Сколько запросов выполнить')
+        parser.add_argument('--duration', type=float, default=None,
+                            help='Длительность прогона в секундах (вместо --requests)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Число параллельных потоков')
+        parser.add_argument('--read-only', action='store_true', help='Только запросы на чтение')
+        parser.add_argument('--seed', type=int, default=None, help='Зерно генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        load_test = LoadTest(
+            total=options['requests'], concurrency=options['concurrency'], duration=options['duration'],
+            read_only=options['read_only'], seed=options['seed'],
+        )
+        try:
+            result = load_test.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f'{"Маршрут":<24}{"Запросов":>10}{"Ошибок":>8}{"p50, мс":>10}{"p95, мс":>10}'
+                          f'{"p99, мс":>10}{"max, мс":>10}')
+        for route in result['routes']:
+            self.stdout.write(
+                f'{route["name"]:<24}{route["requests"]:>10}{route["errors"]:>8}{route["p50"]:>10.1f}'
+                f'{route["p95"]:>10.1f}{route["p99"]:>10.1f}{route["max"]:>10.1f}'
+            )
+        style = self.style.ERROR if result['errors'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Запросов: {result["requests"]} за {result["elapsed"]:.1f} с '
+            f'({result["throughput"]:.1f} в секунду), ошибок: {result["errors"]}'
+        ))
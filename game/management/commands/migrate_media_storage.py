@@ -0,0 +1,128 @@
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from game.cache import invalidate_tags, model_tag
+from game.cards import rebuild_pet_cards
+from game.images import DERIVATIVE_FORMATS, DERIVATIVE_WIDTHS, derivative_name
+from game.jobs import IMAGE_FIELDS
+from game.models import Pet
+from game.storage import content_name, is_content_addressed, path_digest
+
+
+def format_size(size):
+    for unit in ('Б', 'КБ', 'МБ'):
+        if abs(size) < 1024:
+            return f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} ГБ'
+
+
+class Command(BaseCommand):
+    help = ('Переносит загруженные фото в хранилище по хешу содержимого, '
+            'объединяет дубли и показывает освобожденное место')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, ничего не менять')
+        parser.add_argument('--batch', type=int, default=500,
+                            help='Сколько записей обрабатывать за один проход')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.old_files = {}      # старое имя -> (хранилище, размер)
+        self.new_names = {}      # старое имя -> имя по хешу
+        self.written = 0         # байт записано в новое хранилище
+        self.missing = 0
+
+        for model, field_name in IMAGE_FIELDS:
+            moved = self.migrate_field(model, field_name, options['batch'])
+            self.stdout.write(f'{model._meta.verbose_name_plural}: перенесено {moved}')
+
+        removed = 0 if self.dry_run else self.remove_unreferenced()
+        if not self.dry_run:
+            rebuild_pet_cards()
+            invalidate_tags(*(model_tag(model) for model, field_name in IMAGE_FIELDS))
+        before = sum(size for storage, size in self.old_files.values())
+        reclaimed = (before if self.dry_run else removed) - self.written
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов: {len(self.old_files)}, уникальных: {len(set(self.new_names.values()))}, '
+            f'не найдено: {self.missing}. '
+            f'{"Можно освободить (без учета копий)" if self.dry_run else "Освобождено"}: {format_size(reclaimed)}'
+        ))
+
+    def migrate_field(self, model, field_name, batch):
+        storage = model._meta.get_field(field_name).storage
+        queryset = model.objects.exclude(**{field_name: ''}).order_by('pk')
+        moved = 0
+        last_pk = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).values_list('pk', field_name)[:batch])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            for pk, name in rows:
+                if is_content_addressed(name):
+                    continue
+                new_name = self.new_names.get(name) or self.store(storage, name)
+                if new_name is None:
+                    continue
+                if not self.dry_run:
+                    values = {field_name: new_name}
+                    if model is Pet:
+                        values['updated_at'] = timezone.now()
+                    model.objects.filter(pk=pk, **{field_name: name}).update(**values)
+                moved += 1
+        return moved
+
+    def store(self, storage, name):
+        """Кладет файл в хранилище по хешу (или только считает хеш при --dry-run)"""
+        path = storage.path(name)
+        if not os.path.isfile(path):
+            self.missing += 1
+            self.stderr.write(f'Файл не найден: {path}')
+            return None
+
+        size = os.path.getsize(path)
+        _, extension = os.path.splitext(name)
+        new_name = content_name(path_digest(path), extension)
+        is_new = not storage.exists(new_name) and new_name not in self.new_names.values()
+        if is_new:
+            self.written += size
+        if not self.dry_run:
+            with open(path, 'rb') as f:
+                storage.save(name, File(f, name))
+            self.move_derivatives(path, storage.path(new_name))
+
+        self.old_files[name] = (storage, size)
+        self.new_names[name] = new_name
+        return new_name
+
+    def move_derivatives(self, old_path, new_path):
+        """Переименовывает уже созданные копии, чтобы не строить их заново"""
+        for width in DERIVATIVE_WIDTHS:
+            for extension in DERIVATIVE_FORMATS:
+                old = derivative_name(old_path, width, extension)
+                new = derivative_name(new_path, width, extension)
+                if os.path.exists(old) and not os.path.exists(new):
+                    os.replace(old, new)
+
+    def remove_unreferenced(self):
+        """Удаляет старые файлы, на которые больше не ссылается ни одна запись"""
+        removed = 0
+        for name, (storage, size) in self.old_files.items():
+            if any(model.objects.filter(**{field_name: name}).exists() for model, field_name in IMAGE_FIELDS):
+                continue
+            path = storage.path(name)
+            for width in DERIVATIVE_WIDTHS:
+                for extension in DERIVATIVE_FORMATS:
+                    derivative = derivative_name(path, width, extension)
+                    if os.path.exists(derivative):
+                        removed += os.path.getsize(derivative)
+                        os.remove(derivative)
+            if os.path.exists(path):
+                os.remove(path)
+                removed += size
+        return removed
@@ -0,0 +1,64 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from game.images import process_image
+from game.jobs import claim_jobs, job_image, finish_job, requeue_stale_jobs, store_image_metadata
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь загруженных изображений (уменьшение, перекодирование, копии)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Количество процессов (по умолчанию - число ядер)')
+        parser.add_argument('--batch', type=int, default=20,
+                            help='Сколько задач забирать из очереди за раз')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Пауза между опросами пустой очереди, секунд')
+        parser.add_argument('--once', action='store_true',
+                            help='Обработать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs(timedelta(minutes=30))
+        if requeued:
+            self.stdout.write(f'Возвращено в очередь зависших задач: {requeued}')
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                jobs = claim_jobs(options['batch'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                self.process_batch(executor, jobs)
+
+    def process_batch(self, executor, jobs):
+        futures = []
+        for job in jobs:
+            try:
+                image = job_image(job)
+                path = image.path if image else None
+            except Exception as e:
+                finish_job(job, error=str(e))
+                continue
+            if path is None:
+                # Объект удален или фото убрали - делать нечего
+                finish_job(job)
+                continue
+            futures.append((job, image.name, executor.submit(process_image, path)))
+
+        for job, name, future in futures:
+            try:
+                metadata = future.result()
+            except Exception as e:
+                finish_job(job, error=f'{type(e).__name__}: {e}')
+                self.stderr.write(f'{job}: {e}')
+            else:
+                store_image_metadata(job.content_type.model_class(), job.object_id, job.field_name, name, metadata)
+                finish_job(job)
+                self.stdout.write(f'{job}')
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from game.changes import prune
+
+
+class Command(BaseCommand):
+    help = 'Удаляет из журнала изменений записи старше заданного числа дней'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90,
+                            help='Сколько дней хранить записи (по умолчанию 90)')
+
+    def handle(self, *args, **options):
+        deleted = prune(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей журнала: {deleted}'))
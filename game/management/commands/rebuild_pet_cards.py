@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from game.cache import invalidate_tags, model_tag
+from game.cards import rebuild_pet_cards
+from game.models import Pet
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает витрину карточек питомцев (PetCard) из исходных таблиц'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=500,
+                            help='Сколько питомцев обрабатывать за один проход')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_pet_cards(options['batch'])
+        invalidate_tags(model_tag(Pet))
+        self.stdout.write(self.style.SUCCESS(f'Карточек пересобрано: {total}'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from game.cache import invalidate_tags, model_tag
+from game.counters import reconcile_counters
+from game.models import Pet
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счетчики интереса питомцев (избранное, комментарии, заявки, опекунство) '
+        'с данными и исправляет расхождения. Запускать периодически, например из cron'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=500,
+                            help='Сколько питомцев проверять за один проход')
+
+    def handle(self, *args, **options):
+        fixed = reconcile_counters(options['batch'])
+        if fixed:
+            invalidate_tags(model_tag(Pet))
+            self.stdout.write(f'Исправлены счетчики питомцев: {", ".join(map(str, fixed))}')
+        self.stdout.write(self.style.SUCCESS(f'Исправлено питомцев: {len(fixed)}'))
@@ -0,0 +1,166 @@
+"""
+Отдача загруженных файлов (MEDIA_ROOT) в продакшене.
+
+Если перед Django стоит nginx или Apache, сама передача файла отдается им
+через X-Accel-Redirect / X-Sendfile, а Python только проверяет путь и
+выставляет заголовки кеширования. Без прокси файл отдается потоком через
+FileResponse с поддержкой Range, ETag и Last-Modified.
+
+Настройки:
+    MEDIA_X_ACCEL_REDIRECT_PREFIX - internal-location nginx, например "/protected-media/"
+    MEDIA_X_SENDFILE - True, если Apache/lighttpd поддерживает X-Sendfile
+    MEDIA_CACHE_MAX_AGE - время кеширования обычных файлов, секунд
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+
+# Имена с хешем содержимого никогда не меняются - их можно кешировать навсегда
+HASHED_NAME_RE = re.compile(r'(^|[^0-9a-f])[0-9a-f]{16,}([^0-9a-f]|$)')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def is_content_hashed(path):
+    return bool(HASHED_NAME_RE.search(posixpath.basename(path)))
+
+
+def cache_control(path):
+    if is_content_hashed(path):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    max_age = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 60 * 60)
+    return f'public, max-age={max_age}'
+
+
+def file_etag(stat):
+    """Сильный ETag из размера и времени изменения файла"""
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+def parse_range(header, size):
+    """
+    Разбирает заголовок Range с одним диапазоном байт.
+
+    Возвращает (start, end) включительно, None - если диапазон надо
+    проигнорировать и отдать файл целиком, или ValueError для
+    невыполнимого диапазона.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N - последние N байт
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _if_range_matches(request, etag, last_modified):
+    """If-Range: диапазон применяется, только если файл не изменился"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    return if_range in (etag, http_date(last_modified))
+
+
+@require_safe
+def serve_media(request, path):
+    """Отдает файл из MEDIA_ROOT (или поручает это фронтовому прокси)"""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except (ValueError, SuspiciousFileOperation):
+        raise Http404('Файл не найден')
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('Файл не найден')
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден')
+
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, path, full_path, stat, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if response.status_code == 416:
+        # Ответ на неудачный диапазон не должен застрять в кешах на год
+        response['Cache-Control'] = 'no-store'
+    else:
+        response['Cache-Control'] = cache_control(path)
+    return response
+
+
+def _file_response(request, path, full_path, stat, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    accel_prefix = getattr(settings, 'MEDIA_X_ACCEL_REDIRECT_PREFIX', '')
+    if accel_prefix:
+        # nginx сам обработает Range и отдаст файл из internal-location
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(path)
+        return response
+    if getattr(settings, 'MEDIA_X_SENDFILE', False):
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+
+    size = stat.st_size
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _read_range(full_path, start, length), status=206, content_type=content_type
+            )
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+    response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    return response
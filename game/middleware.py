@@ -0,0 +1,132 @@
+"""
+Бюджет запросов к базе на HTTP-запрос и поиск N+1.
+
+QueryBudgetMiddleware оборачивает выполнение SQL (connection.execute_wrapper)
+и считает число запросов и время в базе. Django передает SQL отдельно от
+параметров, поэтому повторяющийся текст запроса - это и есть одинаковая
+"форма": если одна форма выполнилась QUERY_REPEAT_THRESHOLD раз за
+HTTP-запрос, это похоже на N+1 - в этот момент (один раз на форму)
+запоминается, откуда запрос пришел: строка шаблона или строка кода
+приложения.
+
+Если запрос превысил бюджет (QUERY_BUDGET запросов или QUERY_TIME_BUDGET_MS
+миллисекунд в базе) или найден N+1, в лог game.queries пишется
+предупреждение. При QUERY_SERVER_TIMING в ответ добавляется заголовок
+Server-Timing (видно во вкладке Network браузера).
+
+На каждый SQL-запрос приходится лишь замер времени и увеличение счетчика
+в словаре, поэтому middleware можно держать включенным и в продакшене.
+"""
+import logging
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('game.queries')
+
+APP_DIR = str(Path(__file__).resolve().parent)
+
+# Списки IN (%s, %s, ...) разной длины - одна и та же форма запроса
+IN_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+
+
+def fingerprint(sql):
+    return IN_LIST_RE.sub('(%s, ...)', sql)
+
+
+def query_origin():
+    """Откуда выполняется запрос: строка шаблона или кода приложения"""
+    frame = sys._getframe(2)
+    code_line = None
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                return f'{origin.template_name or origin.name}:{token.lineno}'
+        filename = frame.f_code.co_filename
+        if code_line is None and filename.startswith(APP_DIR) and filename != __file__:
+            code_line = f'{Path(filename).relative_to(APP_DIR).as_posix()}:{frame.f_lineno}'
+        frame = frame.f_back
+    return code_line or 'неизвестно'
+
+
+class QueryStats:
+    """Запросы одного HTTP-запроса (обертка для connection.execute_wrapper)"""
+
+    def __init__(self, repeat_threshold):
+        self.repeat_threshold = repeat_threshold
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.repeated = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[sql] += 1
+            if self.shapes[sql] == self.repeat_threshold:
+                self.repeated[sql] = query_origin()
+
+    def repeated_queries(self):
+        """[(форма запроса, сколько раз, откуда)], сначала самые частые"""
+        merged = {}
+        for sql, origin in self.repeated.items():
+            shape = fingerprint(sql)
+            count, _ = merged.get(shape, (0, origin))
+            merged[shape] = (count + self.shapes[sql], origin)
+        return sorted(
+            ((shape, count, origin) for shape, (count, origin) in merged.items()),
+            key=lambda item: -item[1],
+        )
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.budget = getattr(settings, 'QUERY_BUDGET', 50)
+        self.time_budget = getattr(settings, 'QUERY_TIME_BUDGET_MS', 300) / 1000
+        self.repeat_threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', 10)
+        self.server_timing = getattr(settings, 'QUERY_SERVER_TIMING', settings.DEBUG)
+
+    def __call__(self, request):
+        stats = QueryStats(self.repeat_threshold)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} SQL", '
+                f'app;dur={total * 1000:.1f}'
+            )
+        self.report(request, stats)
+        return response
+
+    def report(self, request, stats):
+        repeated = stats.repeated_queries()
+        over_budget = stats.count > self.budget or stats.duration > self.time_budget
+        if not over_budget and not repeated:
+            return
+        lines = [
+            f'{request.method} {request.path}: {stats.count} SQL-запросов, '
+            f'{stats.duration * 1000:.1f} мс в базе'
+        ]
+        for shape, count, origin in repeated:
+            lines.append(f'  возможный N+1: {count} раз из {origin}: {shape[:300]}')
+        logger.warning('\n'.join(lines))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['is_adopted', '-date_added', '-id'], name='pet_catalog_keyset_idx'),
+        ),
+    ]
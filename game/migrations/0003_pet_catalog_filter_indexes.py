@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_pet_catalog_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['is_adopted', 'pet_type', '-date_added'], name='pet_catalog_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['is_adopted', 'shelter', '-date_added'], name='pet_catalog_shelter_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['is_adopted', 'age', 'id'], name='pet_catalog_age_idx'),
+        ),
+    ]
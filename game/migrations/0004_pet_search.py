@@ -0,0 +1,89 @@
+from django.db import migrations
+
+
+# PostgreSQL: хранимая tsvector-колонка с русской морфологией и GIN-индекс.
+# Колонка генерируемая, поэтому база сама пересчитывает ее при изменении полей.
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE game_pet ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(character, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(special_needs, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(history, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX game_pet_search_vector_idx ON game_pet USING gin (search_vector)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS game_pet_search_vector_idx",
+    "ALTER TABLE game_pet DROP COLUMN IF EXISTS search_vector",
+]
+
+# SQLite: внешняя FTS5-таблица поверх game_pet, синхронизируемая триггерами.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE game_pet_fts USING fts5(
+        name, history, character, special_needs,
+        content='game_pet', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER game_pet_fts_insert AFTER INSERT ON game_pet BEGIN
+        INSERT INTO game_pet_fts (rowid, name, history, character, special_needs)
+        VALUES (new.id, new.name, new.history, new.character, new.special_needs);
+    END
+    """,
+    """
+    CREATE TRIGGER game_pet_fts_delete AFTER DELETE ON game_pet BEGIN
+        INSERT INTO game_pet_fts (game_pet_fts, rowid, name, history, character, special_needs)
+        VALUES ('delete', old.id, old.name, old.history, old.character, old.special_needs);
+    END
+    """,
+    """
+    CREATE TRIGGER game_pet_fts_update AFTER UPDATE OF name, history, character, special_needs ON game_pet BEGIN
+        INSERT INTO game_pet_fts (game_pet_fts, rowid, name, history, character, special_needs)
+        VALUES ('delete', old.id, old.name, old.history, old.character, old.special_needs);
+        INSERT INTO game_pet_fts (rowid, name, history, character, special_needs)
+        VALUES (new.id, new.name, new.history, new.character, new.special_needs);
+    END
+    """,
+    "INSERT INTO game_pet_fts (game_pet_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS game_pet_fts_insert",
+    "DROP TRIGGER IF EXISTS game_pet_fts_delete",
+    "DROP TRIGGER IF EXISTS game_pet_fts_update",
+    "DROP TABLE IF EXISTS game_pet_fts",
+]
+
+STATEMENTS = {
+    'postgresql': (POSTGRESQL_FORWARD, POSTGRESQL_BACKWARD),
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def create_search_index(apps, schema_editor):
+    forward, backward = STATEMENTS.get(schema_editor.connection.vendor, ([], []))
+    for statement in forward:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    forward, backward = STATEMENTS.get(schema_editor.connection.vendor, ([], []))
+    for statement in backward:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_pet_catalog_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
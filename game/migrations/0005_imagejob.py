@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('game', '0004_pet_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID объекта')),
+                ('field_name', models.CharField(max_length=50, verbose_name='Поле изображения')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('date_started', models.DateTimeField(blank=True, null=True, verbose_name='Начало обработки')),
+                ('date_finished', models.DateTimeField(blank=True, null=True, verbose_name='Окончание обработки')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Тип объекта')),
+            ],
+            options={
+                'verbose_name': 'Обработка изображения',
+                'verbose_name_plural': 'Обработка изображений',
+                'ordering': ['-date_created'],
+                'indexes': [models.Index(fields=['status', 'id'], name='imagejob_queue_idx'), models.Index(fields=['content_type', 'object_id'], name='imagejob_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_imagejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='happystory',
+            name='photo_after_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота фото'),
+        ),
+        migrations.AddField(
+            model_name='happystory',
+            name='photo_after_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью-заглушка фото'),
+        ),
+        migrations.AddField(
+            model_name='happystory',
+            name='photo_after_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина фото'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='photo_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота фото'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='photo_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью-заглушка фото'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='photo_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина фото'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:29
+
+import game.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_image_placeholders'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='happystory',
+            name='photo_after',
+            field=models.ImageField(storage=game.storage.ContentAddressedStorage(), upload_to='happy_stories/', verbose_name='Фото в новом доме'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='photo',
+            field=models.ImageField(storage=game.storage.ContentAddressedStorage(), upload_to='pets/', verbose_name='Фотография'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+    ]
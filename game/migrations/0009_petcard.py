@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:38
+
+import django.db.models.deletion
+import game.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_pet_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PetCard',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID питомца')),
+                ('name', models.CharField(max_length=100, verbose_name='Кличка')),
+                ('pet_type_name', models.CharField(max_length=50, verbose_name='Тип питомца (название)')),
+                ('shelter_name', models.CharField(max_length=200, verbose_name='Приют (название)')),
+                ('age', models.PositiveIntegerField(verbose_name='Возраст (месяцы)')),
+                ('age_bucket', models.CharField(max_length=10, verbose_name='Возрастная группа')),
+                ('age_display', models.CharField(max_length=30, verbose_name='Возраст')),
+                ('photo', models.ImageField(blank=True, storage=game.storage.ContentAddressedStorage(), upload_to='pets/', verbose_name='Фотография')),
+                ('photo_width', models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина фото')),
+                ('photo_height', models.PositiveIntegerField(blank=True, null=True, verbose_name='Высота фото')),
+                ('photo_placeholder', models.TextField(blank=True, verbose_name='Превью-заглушка фото')),
+                ('thumbnail_url', models.CharField(blank=True, max_length=500, verbose_name='Миниатюра')),
+                ('character_excerpt', models.CharField(blank=True, max_length=200, verbose_name='Характер (кратко)')),
+                ('has_special_needs', models.BooleanField(default=False, verbose_name='Есть особенности')),
+                ('favorites_count', models.PositiveIntegerField(default=0, verbose_name='В избранном')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('is_adopted', models.BooleanField(default=False, verbose_name='Усыновлен')),
+                ('date_added', models.DateTimeField(verbose_name='Дата добавления')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата изменения')),
+                ('pet_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.pettype', verbose_name='Тип питомца')),
+                ('shelter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.shelter', verbose_name='Приют')),
+            ],
+            options={
+                'verbose_name': 'Карточка питомца',
+                'verbose_name_plural': 'Карточки питомцев',
+                'ordering': ['-date_added'],
+                'indexes': [models.Index(fields=['is_adopted', '-date_added', '-id'], name='petcard_keyset_idx'), models.Index(fields=['is_adopted', 'pet_type', '-date_added'], name='petcard_type_idx'), models.Index(fields=['is_adopted', 'shelter', '-date_added'], name='petcard_shelter_idx'), models.Index(fields=['is_adopted', 'age_bucket', '-date_added'], name='petcard_age_bucket_idx'), models.Index(fields=['is_adopted', 'age', 'id'], name='petcard_age_idx'), models.Index(fields=['is_adopted', 'name', 'id'], name='petcard_name_idx')],
+            },
+        ),
+    ]
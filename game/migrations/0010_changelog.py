@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0009_petcard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('pet', 'Питомец'), ('happy_story', 'Счастливая история')], max_length=20, verbose_name='Тип объекта')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID объекта')),
+                ('action', models.CharField(choices=[('created', 'Создан'), ('updated', 'Изменен'), ('adopted', 'Усыновлен'), ('deleted', 'Удален')], max_length=10, verbose_name='Действие')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Запись журнала изменений',
+                'verbose_name_plural': 'Журнал изменений',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['object_type', 'id'], name='changelog_type_seq_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0010_changelog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['pet', 'is_approved', '-date_created', '-id'], name='comment_pet_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:48
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """Начальные значения счетчиков по существующим данным (веса - game.counters)"""
+    Pet = apps.get_model('game', 'Pet')
+    PetCard = apps.get_model('game', 'PetCard')
+
+    def count(model, **filters):
+        return Coalesce(Subquery(
+            model.objects.filter(pet=OuterRef('pk'), **filters).order_by().values('pet')
+            .annotate(count=Count('id')).values('count')
+        ), 0)
+
+    Pet.objects.update(
+        favorites_count=count(apps.get_model('game', 'Favorite')),
+        comments_count=count(apps.get_model('game', 'Comment'), is_approved=True),
+        applications_count=count(apps.get_model('game', 'AdoptionApplication')),
+        sponsorship_total=Coalesce(Subquery(
+            apps.get_model('game', 'Sponsorship').objects
+            .filter(pet=OuterRef('pk'), is_active=True).order_by().values('pet')
+            .annotate(total=Sum('amount')).values('total')
+        ), Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    )
+    pets = Pet.objects.filter(pk=OuterRef('pk'))
+    PetCard.objects.update(**{
+        name: Subquery(pets.values(name)[:1])
+        for name in ('favorites_count', 'comments_count', 'applications_count', 'sponsorship_total')
+    })
+    PetCard.objects.update(
+        popularity=F('favorites_count') * 2 + F('comments_count') + F('applications_count') * 5
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0011_comment_pet_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='applications_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Заявок'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='sponsorship_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Сумма опекунства'),
+        ),
+        migrations.AddField(
+            model_name='petcard',
+            name='applications_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Заявок'),
+        ),
+        migrations.AddField(
+            model_name='petcard',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='petcard',
+            name='sponsorship_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Сумма опекунства'),
+        ),
+        migrations.AddIndex(
+            model_name='petcard',
+            index=models.Index(fields=['is_adopted', '-popularity', '-id'], name='petcard_popularity_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
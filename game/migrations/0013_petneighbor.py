@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0012_pet_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PetNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('date_computed', models.DateTimeField(auto_now_add=True, verbose_name='Дата расчета')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='game.petcard', verbose_name='Похожий питомец')),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='game.pet', verbose_name='Питомец')),
+            ],
+            options={
+                'verbose_name': 'Похожий питомец',
+                'verbose_name_plural': 'Похожие питомцы',
+                'unique_together': {('pet', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0013_petneighbor'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='petneighbor',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='petneighbor',
+            name='source',
+            field=models.CharField(choices=[('interest', 'По интересу посетителей'), ('content', 'По описанию')], default='interest', max_length=10, verbose_name='Источник'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='petneighbor',
+            unique_together={('pet', 'source', 'rank')},
+        ),
+    ]
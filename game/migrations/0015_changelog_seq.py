@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:11
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def number_existing(apps, schema_editor):
+    # Уже выданные клиентам номера - id записей, их сохраняем
+    ChangeLog = apps.get_model('game', 'ChangeLog')
+    ChangeLog.objects.update(seq=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0014_petneighbor_source'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='changelog',
+            name='changelog_type_seq_idx',
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='seq',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='Номер в ленте'),
+        ),
+        migrations.RunPython(number_existing, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['object_type', 'seq'], name='changelog_type_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(condition=models.Q(('seq__isnull', True)), fields=['id'], name='changelog_unsequenced_idx'),
+        ),
+    ]
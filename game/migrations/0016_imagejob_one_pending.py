@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+def drop_duplicate_pending(apps, schema_editor):
+    # Из нескольких задач в очереди на одно фото оставляем самую раннюю
+    ImageJob = apps.get_model('game', 'ImageJob')
+    seen = set()
+    duplicates = []
+    rows = ImageJob.objects.filter(status='pending').order_by('id').values_list(
+        'id', 'content_type_id', 'object_id', 'field_name'
+    )
+    for job_id, *key in rows:
+        if tuple(key) in seen:
+            duplicates.append(job_id)
+        seen.add(tuple(key))
+    ImageJob.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('game', '0015_changelog_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_pending, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='imagejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('content_type', 'object_id', 'field_name'), name='imagejob_one_pending_uniq'),
+        ),
+    ]
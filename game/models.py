@@ -1,6 +1,10 @@
 from django.db import models
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+
+from .storage import content_storage
 
 
 class PetType(models.Model):
@@ -37,12 +41,26 @@ class Pet(models.Model):
     """Модель питомца"""
     name = models.CharField(max_length=100, verbose_name="Кличка")
     age = models.PositiveIntegerField(verbose_name="Возраст (месяцы)")
-    photo = models.ImageField(upload_to='pets/', verbose_name="Фотография")
+    photo = models.ImageField(upload_to='pets/', storage=content_storage, verbose_name="Фотография")
+    # Заполняются при обработке фото (см. game.images.image_metadata)
+    photo_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Ширина фото")
+    photo_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Высота фото")
+    photo_placeholder = models.TextField(blank=True, editable=False, verbose_name="Превью-заглушка фото")
     history = models.TextField(verbose_name="История питомца")
     character = models.TextField(verbose_name="Характер")
     special_needs = models.TextField(blank=True, verbose_name="Особенности")
     is_adopted = models.BooleanField(default=False, verbose_name="Усыновлен")
     date_added = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления")
+    # Версия для кеша карточек (см. game.templatetags.pet_cards)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+    # Счетчики интереса: меняются сигналами через F() (см. game.counters)
+    # и сверяются командой reconcile_pet_counters
+    favorites_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="В избранном")
+    comments_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Комментариев")
+    applications_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Заявок")
+    sponsorship_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="Сумма опекунства"
+    )
     
     # Внешние ключи
     pet_type = models.ForeignKey(
@@ -60,10 +78,29 @@ class Pet(models.Model):
         verbose_name = "Питомец"
         verbose_name_plural = "Питомцы"
         ordering = ['-date_added']
+        indexes = [
+            # Для пагинации каталога по курсору (-date_added, -id)
+            models.Index(fields=['is_adopted', '-date_added', '-id'], name='pet_catalog_keyset_idx'),
+            # Для фильтров и фасетов каталога
+            models.Index(fields=['is_adopted', 'pet_type', '-date_added'], name='pet_catalog_type_idx'),
+            models.Index(fields=['is_adopted', 'shelter', '-date_added'], name='pet_catalog_shelter_idx'),
+            models.Index(fields=['is_adopted', 'age', 'id'], name='pet_catalog_age_idx'),
+        ]
+    
+    COUNTER_FIELDS = ('favorites_count', 'comments_count', 'applications_count', 'sponsorship_total')
     
     def __str__(self):
         return f"{self.name} ({self.pet_type.name})"
     
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # Счетчики в загруженном объекте могли устареть - обычное сохранение
+        # (например, из админки) не должно затирать их значения в базе.
+        # Если строки уже нет, UPDATE ничего не изменит и save вставит ее
+        # заново со всеми полями, как обычно
+        if update_fields is None:
+            values = [value for value in values if value[0].name not in self.COUNTER_FIELDS]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+    
     def get_absolute_url(self):
         return reverse('pet_detail', kwargs={'pk': self.pk})
     
@@ -141,7 +178,10 @@ class HappyStory(models.Model):
     story = models.TextField(verbose_name="История")
     new_owner_name = models.CharField(max_length=100, verbose_name="Имя нового хозяина")
     adoption_date = models.DateField(verbose_name="Дата усыновления")
-    photo_after = models.ImageField(upload_to='happy_stories/', verbose_name="Фото в новом доме")
+    photo_after = models.ImageField(upload_to='happy_stories/', storage=content_storage, verbose_name="Фото в новом доме")
+    photo_after_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Ширина фото")
+    photo_after_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Высота фото")
+    photo_after_placeholder = models.TextField(blank=True, editable=False, verbose_name="Превью-заглушка фото")
     is_published = models.BooleanField(default=True, verbose_name="Опубликовано")
     date_created = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     
@@ -197,6 +237,10 @@ class Comment(models.Model):
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
         ordering = ['-date_created']
+        indexes = [
+            # Порции одобренных комментариев питомца по курсору (-date_created, -id)
+            models.Index(fields=['pet', 'is_approved', '-date_created', '-id'], name='comment_pet_keyset_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username}: {self.content[:50]}..."
@@ -308,3 +352,168 @@ class PaymentInfo(models.Model):
         elif self.payment_type == 'wallet':
             return self.card_number
         return ""
+
+
+class ImageJob(models.Model):
+    """Задача фоновой обработки загруженного изображения"""
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('processing', 'Обрабатывается'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name="Тип объекта")
+    object_id = models.PositiveBigIntegerField(verbose_name="ID объекта")
+    content_object = GenericForeignKey('content_type', 'object_id')
+    field_name = models.CharField(max_length=50, verbose_name="Поле изображения")
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    
+    date_created = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    date_started = models.DateTimeField(null=True, blank=True, verbose_name="Начало обработки")
+    date_finished = models.DateTimeField(null=True, blank=True, verbose_name="Окончание обработки")
+    
+    class Meta:
+        verbose_name = "Обработка изображения"
+        verbose_name_plural = "Обработка изображений"
+        ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='imagejob_queue_idx'),
+            models.Index(fields=['content_type', 'object_id'], name='imagejob_object_idx'),
+        ]
+        constraints = [
+            # В очереди не больше одной задачи на фото (см. game.jobs)
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'field_name'], condition=models.Q(status='pending'),
+                name='imagejob_one_pending_uniq',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.content_type.model} #{self.object_id}.{self.field_name} ({self.get_status_display()})"
+
+
+class PetCard(models.Model):
+    """
+    Денормализованная карточка питомца для каталога и API.
+
+    Одна узкая таблица вместо соединения game_pet, game_pettype и game_shelter:
+    названия, возрастная группа, превью характера и счетчики считаются заранее
+    и поддерживаются сигналами (см. game.cards). Первичный ключ совпадает с
+    id питомца.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID питомца")
+    name = models.CharField(max_length=100, verbose_name="Кличка")
+    pet_type = models.ForeignKey(PetType, on_delete=models.CASCADE, verbose_name="Тип питомца")
+    pet_type_name = models.CharField(max_length=50, verbose_name="Тип питомца (название)")
+    shelter = models.ForeignKey(Shelter, on_delete=models.CASCADE, verbose_name="Приют")
+    shelter_name = models.CharField(max_length=200, verbose_name="Приют (название)")
+    age = models.PositiveIntegerField(verbose_name="Возраст (месяцы)")
+    age_bucket = models.CharField(max_length=10, verbose_name="Возрастная группа")
+    age_display = models.CharField(max_length=30, verbose_name="Возраст")
+    photo = models.ImageField(upload_to='pets/', storage=content_storage, blank=True, verbose_name="Фотография")
+    photo_width = models.PositiveIntegerField(null=True, blank=True, verbose_name="Ширина фото")
+    photo_height = models.PositiveIntegerField(null=True, blank=True, verbose_name="Высота фото")
+    photo_placeholder = models.TextField(blank=True, verbose_name="Превью-заглушка фото")
+    thumbnail_url = models.CharField(max_length=500, blank=True, verbose_name="Миниатюра")
+    character_excerpt = models.CharField(max_length=200, blank=True, verbose_name="Характер (кратко)")
+    has_special_needs = models.BooleanField(default=False, verbose_name="Есть особенности")
+    favorites_count = models.PositiveIntegerField(default=0, verbose_name="В избранном")
+    comments_count = models.PositiveIntegerField(default=0, verbose_name="Комментариев")
+    applications_count = models.PositiveIntegerField(default=0, verbose_name="Заявок")
+    sponsorship_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Сумма опекунства")
+    # Взвешенная сумма счетчиков для сортировки "Сначала популярные" (game.counters)
+    popularity = models.PositiveIntegerField(default=0, verbose_name="Популярность")
+    is_adopted = models.BooleanField(default=False, verbose_name="Усыновлен")
+    date_added = models.DateTimeField(verbose_name="Дата добавления")
+    updated_at = models.DateTimeField(verbose_name="Дата изменения")
+    
+    class Meta:
+        verbose_name = "Карточка питомца"
+        verbose_name_plural = "Карточки питомцев"
+        ordering = ['-date_added']
+        indexes = [
+            models.Index(fields=['is_adopted', '-date_added', '-id'], name='petcard_keyset_idx'),
+            models.Index(fields=['is_adopted', 'pet_type', '-date_added'], name='petcard_type_idx'),
+            models.Index(fields=['is_adopted', 'shelter', '-date_added'], name='petcard_shelter_idx'),
+            models.Index(fields=['is_adopted', 'age_bucket', '-date_added'], name='petcard_age_bucket_idx'),
+            models.Index(fields=['is_adopted', 'age', 'id'], name='petcard_age_idx'),
+            models.Index(fields=['is_adopted', 'name', 'id'], name='petcard_name_idx'),
+            models.Index(fields=['is_adopted', '-popularity', '-id'], name='petcard_popularity_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.pet_type_name})"
+    
+    def get_absolute_url(self):
+        return reverse('pet_detail', kwargs={'pk': self.pk})
+
+
+class PetNeighbor(models.Model):
+    """
+    Похожий питомец для блока "Вам могут понравиться": по совместному интересу
+    посетителей (game.recommendations) или по описанию (game.similarity).
+    """
+    SOURCE_CHOICES = [
+        ('interest', 'По интересу посетителей'),
+        ('content', 'По описанию'),
+    ]
+    
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='neighbors', verbose_name="Питомец")
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='interest', verbose_name="Источник")
+    neighbor = models.ForeignKey(PetCard, on_delete=models.CASCADE, related_name='+', verbose_name="Похожий питомец")
+    rank = models.PositiveSmallIntegerField(verbose_name="Место")
+    score = models.FloatField(verbose_name="Сходство")
+    date_computed = models.DateTimeField(auto_now_add=True, verbose_name="Дата расчета")
+    
+    class Meta:
+        verbose_name = "Похожий питомец"
+        verbose_name_plural = "Похожие питомцы"
+        # Уникальный индекс (pet, source, rank) - по нему читается блок на странице питомца
+        unique_together = ['pet', 'source', 'rank']
+    
+    def __str__(self):
+        return f"{self.pet_id} -> {self.neighbor_id} ({self.score:.2f})"
+
+
+class ChangeLog(models.Model):
+    """
+    Журнал изменений питомцев и счастливых историй для ленты /api/changes/.
+
+    Записи только добавляются; удаление объекта оставляет запись-надгробие
+    с action='deleted'. Номер в ленте (seq) выдается после фиксации
+    транзакции (см. game.changes), а не при вставке, как id.
+    """
+    OBJECT_TYPES = [
+        ('pet', 'Питомец'),
+        ('happy_story', 'Счастливая история'),
+    ]
+    ACTIONS = [
+        ('created', 'Создан'),
+        ('updated', 'Изменен'),
+        ('adopted', 'Усыновлен'),
+        ('deleted', 'Удален'),
+    ]
+    
+    object_type = models.CharField(max_length=20, choices=OBJECT_TYPES, verbose_name="Тип объекта")
+    object_id = models.PositiveBigIntegerField(verbose_name="ID объекта")
+    action = models.CharField(max_length=10, choices=ACTIONS, verbose_name="Действие")
+    date_created = models.DateTimeField(auto_now_add=True, verbose_name="Дата")
+    seq = models.PositiveBigIntegerField(null=True, blank=True, unique=True, editable=False, verbose_name="Номер в ленте")
+    
+    class Meta:
+        verbose_name = "Запись журнала изменений"
+        verbose_name_plural = "Журнал изменений"
+        ordering = ['id']
+        indexes = [
+            # Выборка ленты одного типа объектов начиная с номера
+            models.Index(fields=['object_type', 'seq'], name='changelog_type_seq_idx'),
+            # Записи, еще не получившие номер
+            models.Index(fields=['id'], condition=models.Q(seq__isnull=True), name='changelog_unsequenced_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.pk} {self.object_type} {self.object_id} {self.action}"
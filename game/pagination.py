@@ -0,0 +1,128 @@
+import base64
+import json
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    """Курсор поврежден или не подходит к текущей сортировке"""
+    pass
+
+
+class KeysetPage:
+    """Страница, полученная по курсору (без COUNT и OFFSET)"""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинация по ключу сортировки.
+
+    Вместо OFFSET страница выбирается условием "строго после/до" последней
+    показанной записи, поэтому глубокие страницы стоят столько же, сколько
+    первая. Последнее поле сортировки должно быть уникальным (обычно id).
+    Курсор - непрозрачная строка с направлением и значениями полей сортировки.
+    """
+
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, queryset, per_page, ordering=('-date_added', '-id')):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу для курсора (пустой курсор - первая страница)"""
+        if not cursor:
+            direction, values = self.NEXT, None
+        else:
+            direction, values = self.decode_cursor(cursor)
+
+        if direction == self.PREVIOUS:
+            ordering = [self._reverse(name) for name in self.ordering]
+        else:
+            ordering = list(self.ordering)
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(ordering, values))
+
+        # Берем на одну запись больше, чтобы узнать, есть ли что-то дальше
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == self.PREVIOUS:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(self.NEXT, rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(self.PREVIOUS, rows[0])
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+    def encode_cursor(self, direction, obj):
+        opts = self.queryset.model._meta
+        values = [opts.get_field(name).value_to_string(obj) for name in self.fields]
+        payload = json.dumps([direction] + values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            direction, values = payload[0], payload[1:]
+            if direction not in (self.NEXT, self.PREVIOUS) or len(values) != len(self.fields):
+                raise ValueError(cursor)
+            opts = self.queryset.model._meta
+            values = [opts.get_field(name).to_python(value) for name, value in zip(self.fields, values)]
+        except Exception:
+            raise InvalidCursor('Неверный курсор страницы')
+        return direction, values
+
+    @staticmethod
+    def _reverse(name):
+        return name[1:] if name.startswith('-') else '-' + name
+
+    def _after(self, ordering, values):
+        """Условие "запись идет после values" для лексикографической сортировки"""
+        condition = Q()
+        for position in reversed(range(len(ordering))):
+            name = ordering[position]
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[position]})
+            if position < len(ordering) - 1:
+                step |= Q(**{field: values[position]}) & condition
+            condition = step
+        return condition
@@ -0,0 +1,200 @@
+"""
+Рекомендации "Вам могут понравиться": похожие питомцы по совместным
+предпочтениям посетителей (item-item, косинусная мера).
+
+Из избранного, заявок и опекунства строится разреженная матрица
+пользователь x питомец (вес взаимодействия - INTERACTION_WEIGHTS). Сходство
+двух питомцев - косинус между их столбцами: чем больше людей интересовались
+обоими, тем ближе питомцы. Для каждого питомца хранятся NEIGHBORS_PER_PET
+ближайших соседей в таблице PetNeighbor, и страница питомца читает их одним
+запросом по индексу (pet, source, rank) - вместе с соседями по описанию
+(game.similarity), которые выручают новых питомцев без истории интереса.
+
+Считается командой build_recommendations: полностью или только для
+питомцев, у которых с прошлого расчета появились новые взаимодействия.
+Матрица перемножается блоками по BLOCK_SIZE питомцев (NumPy и SciPy),
+поэтому память ограничена размером блока.
+
+При частичном расчете у изменившихся питомцев растут нормы столбцов, и
+сходство с ними у остальных питомцев падает - поэтому пересчитываются и
+питомцы, у которых изменившиеся есть в списке соседей. Сходство при этом
+может только уменьшиться, и новые соседи в чужие списки не попадают.
+Удаленные избранное, заявки и опекунство частичный расчет не видит (у них
+нет даты), их учитывает только полный расчет (--full), который стоит
+запускать периодически.
+"""
+import heapq
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+from scipy import sparse
+
+from .models import AdoptionApplication, Favorite, PetCard, PetNeighbor, Sponsorship
+
+
+# Заявка на усыновление говорит об интересе сильнее, чем избранное
+INTERACTION_WEIGHTS = {
+    'favorite': 1.0,
+    'application': 3.0,
+    'sponsorship': 2.0,
+}
+
+NEIGHBORS_PER_PET = 12
+BLOCK_SIZE = 256
+
+# Сколько похожих питомцев показывать на странице
+SIMILAR_PETS_SHOWN = 6
+
+
+def _interaction_sources():
+    return [
+        ('favorite', Favorite.objects.all(), 'date_added'),
+        ('application', AdoptionApplication.objects.all(), 'date_created'),
+        ('sponsorship', Sponsorship.objects.filter(is_active=True), 'date_created'),
+    ]
+
+
+def load_interactions():
+    """Веса взаимодействий {(user_id, pet_id): вес}"""
+    weights = defaultdict(float)
+    for kind, queryset, date_field in _interaction_sources():
+        rows = queryset.values_list('user_id', 'pet_id').iterator(chunk_size=5000)
+        for user_id, pet_id in rows:
+            weights[(user_id, pet_id)] += INTERACTION_WEIGHTS[kind]
+    return weights
+
+
+def changed_pets(since):
+    """
+    Питомцы, чьи соседи могли измениться после since: все питомцы
+    пользователей, у которых с тех пор появились взаимодействия.
+    """
+    users = set()
+    for kind, queryset, date_field in _interaction_sources():
+        users.update(queryset.filter(**{f'{date_field}__gt': since}).values_list('user_id', flat=True))
+    pets = set()
+    for kind, queryset, date_field in _interaction_sources():
+        pets.update(queryset.filter(user_id__in=users).values_list('pet_id', flat=True))
+    return pets
+
+
+def _top(scores, k):
+    return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def _neighbors(weights, targets, k):
+    users = {user_id: index for index, user_id in enumerate({user_id for user_id, _ in weights})}
+    pet_ids = sorted({pet_id for _, pet_id in weights})
+    pets = {pet_id: index for index, pet_id in enumerate(pet_ids)}
+    rows = np.fromiter((users[user_id] for user_id, _ in weights), dtype=np.int32, count=len(weights))
+    cols = np.fromiter((pets[pet_id] for _, pet_id in weights), dtype=np.int32, count=len(weights))
+    data = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+    matrix = sparse.csc_matrix((data, (rows, cols)), shape=(len(users), len(pet_ids)))
+
+    # Нормируем столбцы: тогда скалярное произведение столбцов - косинус
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0))).ravel()
+    norms[norms == 0] = 1
+    matrix = (matrix @ sparse.diags(1 / norms)).tocsc()
+    transposed = matrix.T.tocsr()
+
+    targets = [pets[pet_id] for pet_id in targets if pet_id in pets]
+    result = {}
+    for start in range(0, len(targets), BLOCK_SIZE):
+        block = targets[start:start + BLOCK_SIZE]
+        similarities = (transposed[block] @ matrix).tocsr()
+        for offset, column in enumerate(block):
+            row = similarities.getrow(offset)
+            scores = {
+                pet_ids[index]: float(score)
+                for index, score in zip(row.indices, row.data)
+                if index != column and score > 0
+            }
+            result[pet_ids[column]] = _top(scores, k)
+    return result
+
+
+def compute_neighbors(pet_ids=None, k=NEIGHBORS_PER_PET):
+    """
+    Ближайшие соседи питомцев pet_ids (None - всех, у кого есть
+    взаимодействия): {pet_id: [(neighbor_id, сходство), ...]}
+    """
+    weights = load_interactions()
+    if pet_ids is None:
+        pet_ids = {pet_id for _, pet_id in weights}
+    if not weights or not pet_ids:
+        return {}
+    return _neighbors(weights, pet_ids, k)
+
+
+def save_neighbors(neighbors, pet_ids, source='interest'):
+    """Заменяет соседей питомцев pet_ids (у кого их нет в neighbors - удаляет)"""
+    existing = set(PetCard.objects.filter(
+        pk__in={neighbor_id for items in neighbors.values() for neighbor_id, _ in items}
+    ).values_list('pk', flat=True))
+    rows = [
+        PetNeighbor(pet_id=pet_id, source=source, neighbor_id=neighbor_id, rank=rank, score=score)
+        for pet_id, items in neighbors.items()
+        for rank, (neighbor_id, score) in enumerate(
+            [item for item in items if item[0] in existing], start=1
+        )
+    ]
+    with transaction.atomic():
+        PetNeighbor.objects.filter(pet_id__in=pet_ids, source=source).delete()
+        PetNeighbor.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def build_recommendations(full=False):
+    """
+    Пересчитывает соседей; без full - только для питомцев с новыми
+    взаимодействиями после прошлого расчета. Возвращает (питомцев, соседей).
+    """
+    stored = PetNeighbor.objects.filter(source='interest')
+    last_built = stored.aggregate(last=Max('date_computed'))['last']
+    if full or last_built is None:
+        neighbors = compute_neighbors()
+        pet_ids = set(neighbors) | set(stored.values_list('pet_id', flat=True).distinct())
+    else:
+        pet_ids = changed_pets(last_built)
+        if not pet_ids:
+            return 0, 0
+        # Сходство с изменившимися питомцами у их соседей уменьшилось
+        pet_ids |= set(stored.filter(neighbor_id__in=pet_ids).values_list('pet_id', flat=True))
+        neighbors = compute_neighbors(pet_ids)
+    return len(pet_ids), save_neighbors(neighbors, pet_ids)
+
+
+def similar_pets(pet, limit=SIMILAR_PETS_SHOWN):
+    """
+    Карточки похожих питомцев, которые еще ищут дом (один запрос): сначала
+    по интересу посетителей, оставшиеся места - по описанию.
+    """
+    neighbors = (
+        PetNeighbor.objects.filter(pet=pet, rank__lte=limit, neighbor__is_adopted=False)
+        .select_related('neighbor').order_by('rank')
+    )
+    ordered = sorted(neighbors, key=lambda neighbor: neighbor.source != 'interest')
+    cards = {}
+    for neighbor in ordered:
+        cards.setdefault(neighbor.neighbor_id, neighbor.neighbor)
+    return list(cards.values())[:limit]
+
+
+def similar_to_pets(pet_ids, limit=SIMILAR_PETS_SHOWN):
+    """
+    Карточки питомцев, похожих по описанию сразу на несколько (для страницы
+    сравнения): сходства с каждым из pet_ids складываются.
+    """
+    neighbors = (
+        PetNeighbor.objects.filter(
+            pet_id__in=pet_ids, source='content', rank__lte=NEIGHBORS_PER_PET, neighbor__is_adopted=False
+        ).exclude(neighbor_id__in=pet_ids).select_related('neighbor')
+    )
+    scores = defaultdict(float)
+    cards = {}
+    for neighbor in neighbors:
+        scores[neighbor.neighbor_id] += neighbor.score
+        cards[neighbor.neighbor_id] = neighbor.neighbor
+    return [cards[pet_id] for pet_id, score in _top(scores, limit)]
@@ -0,0 +1,137 @@
+"""
+Полнотекстовый поиск по питомцам.
+
+Индекс строится по полям name, history, character и special_needs и
+поддерживается самой базой данных (см. миграцию 0004_pet_search):
+
+* PostgreSQL - хранимая колонка game_pet.search_vector (tsvector с русской
+  морфологией и весами полей) и GIN-индекс по ней;
+* SQLite - виртуальная таблица FTS5 game_pet_fts, синхронизируемая
+  триггерами. Русского стеммера в FTS5 нет, поэтому слова ищутся по префиксу.
+  SQLite теряет триггеры при пересоздании таблицы в миграциях, поэтому после
+  каждого migrate они восстанавливаются (ensure_search_triggers).
+
+На остальных СУБД используется обычный поиск по подстроке.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Pet
+
+
+SEARCH_FIELDS = ['name', 'history', 'character', 'special_needs']
+
+FTS_TABLE = 'game_pet_fts'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_TRIGGERS = {
+    'game_pet_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS game_pet_fts_insert AFTER INSERT ON game_pet BEGIN
+            INSERT INTO game_pet_fts (rowid, name, history, character, special_needs)
+            VALUES (new.id, new.name, new.history, new.character, new.special_needs);
+        END
+    """,
+    'game_pet_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS game_pet_fts_delete AFTER DELETE ON game_pet BEGIN
+            INSERT INTO game_pet_fts (game_pet_fts, rowid, name, history, character, special_needs)
+            VALUES ('delete', old.id, old.name, old.history, old.character, old.special_needs);
+        END
+    """,
+    'game_pet_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS game_pet_fts_update
+        AFTER UPDATE OF name, history, character, special_needs ON game_pet BEGIN
+            INSERT INTO game_pet_fts (game_pet_fts, rowid, name, history, character, special_needs)
+            VALUES ('delete', old.id, old.name, old.history, old.character, old.special_needs);
+            INSERT INTO game_pet_fts (rowid, name, history, character, special_needs)
+            VALUES (new.id, new.name, new.history, new.character, new.special_needs);
+        END
+    """,
+}
+
+
+def _fts5_query(query):
+    """Строка запроса FTS5: все слова обязательны, каждое ищется по префиксу"""
+    words = WORD_RE.findall(query.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _empty(queryset):
+    return queryset.annotate(rank=Value(0.0, output_field=FloatField())).none()
+
+
+def search_pets(query, queryset=None):
+    """
+    Возвращает queryset питомцев, подходящих под запрос, с аннотацией rank.
+
+    Чем больше rank, тем релевантнее запись. Сортировка по rank не
+    навязывается, чтобы вызывающий код мог сам решить, как упорядочивать.
+    """
+    if queryset is None:
+        queryset = Pet.objects.all()
+    query = (query or '').strip()
+    if not query:
+        return _empty(queryset)
+
+    table = Pet._meta.db_table
+    vendor = connection.vendor
+
+    if vendor == 'postgresql':
+        tsquery = "websearch_to_tsquery('russian', %s)"
+        return queryset.annotate(
+            rank=RawSQL(f'ts_rank_cd({table}.search_vector, {tsquery})', [query], output_field=FloatField())
+        ).filter(
+            RawSQL(f'{table}.search_vector @@ {tsquery}', [query], output_field=BooleanField())
+        )
+
+    if vendor == 'sqlite':
+        match = _fts5_query(query)
+        if not match:
+            return _empty(queryset)
+        # bm25 возвращает тем меньшее число, чем лучше совпадение; веса полей
+        # в порядке SEARCH_FIELDS
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        ).annotate(
+            rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, 10.0, 2.0, 5.0, 5.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id',
+                [match], output_field=FloatField()
+            )
+        )
+
+    condition = Q()
+    for word in WORD_RE.findall(query):
+        word_condition = Q()
+        for field in SEARCH_FIELDS:
+            word_condition |= Q(**{f'{field}__icontains': word})
+        condition &= word_condition
+    return queryset.filter(condition).annotate(rank=Value(1.0, output_field=FloatField()))
+
+
+def ensure_search_triggers(using='default', **kwargs):
+    """
+    Восстанавливает триггеры FTS5 после migrate (обработчик post_migrate).
+
+    Если хотя бы один триггер пропал, индекс перестраивается целиком, так как
+    изменения, прошедшие без триггера, в него не попали.
+    """
+    from django.db import connections
+
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            return
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'game_pet'")
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing.issuperset(SQLITE_TRIGGERS):
+            return
+        for statement in SQLITE_TRIGGERS.values():
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
@@ -0,0 +1,235 @@
+import logging
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import invalidate_on_commit, model_tag
+from .cards import sync_pet_cards
+from .changes import log_change, log_changes
+from .counters import change_counters
+from .favorites import invalidate_favorites
+from .images import has_derivatives, process_image
+from .jobs import enqueue_image_job, is_async, store_image_metadata
+from .models import (
+    FAQ, AdoptionApplication, Comment, Favorite, HappyStory, HelpInfo, ImageJob, PaymentInfo, Pet,
+    PetCard, PetType, Shelter, Sponsorship,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _schedule_image_processing(instance, field_name):
+    image = getattr(instance, field_name)
+    if not image:
+        return
+    try:
+        path = image.path
+    except NotImplementedError:
+        return
+    if has_derivatives(path):
+        return
+    if is_async():
+        enqueue_image_job(instance, field_name)
+        return
+    try:
+        metadata = process_image(path)
+    except OSError:
+        # Битый или отсутствующий файл не должен мешать сохранению записи
+        logger.warning('Не удалось обработать изображение %s', path, exc_info=True)
+        return
+    store_image_metadata(type(instance), instance.pk, field_name, image.name, metadata)
+
+
+@receiver(post_save, sender=Pet)
+def pet_photo_processing(sender, instance, **kwargs):
+    """Обработка фото питомца для карточек"""
+    _schedule_image_processing(instance, 'photo')
+
+
+@receiver(post_save, sender=HappyStory)
+def happy_story_photo_processing(sender, instance, **kwargs):
+    """Обработка фото из счастливой истории"""
+    _schedule_image_processing(instance, 'photo_after')
+
+
+# Модели, от которых зависят закешированные страницы и фрагменты (game.cache);
+# от очереди ImageJob зависит заглушка "Фото обрабатывается"
+CACHED_MODELS = [Pet, PetType, Shelter, HappyStory, HelpInfo, PaymentInfo, FAQ, ImageJob]
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_pages(sender, **kwargs):
+    """Сбрасывает кеш страниц, зависящих от измененной модели"""
+    if sender in CACHED_MODELS:
+        invalidate_on_commit(model_tag(sender))
+
+
+@receiver(post_save, sender=PetType)
+@receiver(post_save, sender=Shelter)
+def touch_pets(sender, instance, created, **kwargs):
+    """
+    Название типа или приюта выводится в карточке питомца, а карточки
+    кешируются по Pet.updated_at - обновляем его у всех связанных питомцев.
+    """
+    if created:
+        return
+    field = 'pet_type' if sender is PetType else 'shelter'
+    now = timezone.now()
+    pets = Pet.objects.filter(**{field: instance})
+    log_changes(Pet, pets.values_list('pk', flat=True), 'updated')
+    pets.update(updated_at=now)
+    PetCard.objects.filter(**{field: instance}).update(**{f'{field}_name': instance.name, 'updated_at': now})
+
+
+# Витрина карточек (game.cards) обновляется в той же транзакции, что и данные
+
+@receiver(post_save, sender=Pet)
+@receiver(post_delete, sender=Pet)
+def sync_pet_card(sender, instance, **kwargs):
+    sync_pet_cards([instance.pk])
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_added(sender, instance, created, **kwargs):
+    if created:
+        change_counters(instance.pet_id, favorites_count=1)
+    invalidate_favorites(instance.user_id)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_removed(sender, instance, **kwargs):
+    change_counters(instance.pet_id, favorites_count=-1)
+    invalidate_favorites(instance.user_id)
+
+
+# Счетчики интереса (game.counters) меняются на разницу между сохраненным
+# и загруженным состоянием объекта
+
+@receiver(post_init, sender=Comment)
+def remember_comment_state(sender, instance, **kwargs):
+    instance._loaded_counted = instance.pk is not None and instance.__dict__.get('is_approved')
+
+
+@receiver(pre_save, sender=Comment)
+@receiver(pre_delete, sender=Comment)
+def load_comment_state(sender, instance, **kwargs):
+    """
+    Комментарий загружен без is_approved (only/defer): исходное состояние
+    берется из базы до изменения. refresh_from_db не подходит - он затер бы
+    значение, уже присвоенное объекту.
+    """
+    if instance._loaded_counted is None:
+        instance._loaded_counted = bool(
+            Comment.objects.filter(pk=instance.pk).values_list('is_approved', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, **kwargs):
+    delta = int(instance.is_approved) - int(bool(instance._loaded_counted))
+    change_counters(instance.pet_id, comments_count=delta)
+    instance._loaded_counted = instance.is_approved
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance._loaded_counted:
+        change_counters(instance.pet_id, comments_count=-1)
+
+
+@receiver(post_save, sender=AdoptionApplication)
+def application_added(sender, instance, created, **kwargs):
+    if created:
+        change_counters(instance.pet_id, applications_count=1)
+
+
+@receiver(post_delete, sender=AdoptionApplication)
+def application_removed(sender, instance, **kwargs):
+    change_counters(instance.pet_id, applications_count=-1)
+
+
+def _sponsorship_amount(instance):
+    return instance.amount if instance.is_active and instance.amount else 0
+
+
+@receiver(post_init, sender=Sponsorship)
+def remember_sponsorship_state(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._loaded_amount = 0
+    elif 'amount' not in instance.__dict__ or 'is_active' not in instance.__dict__:
+        # Поля отложены - загрузит load_sponsorship_state
+        instance._loaded_amount = None
+    else:
+        instance._loaded_amount = _sponsorship_amount(instance)
+
+
+@receiver(pre_save, sender=Sponsorship)
+@receiver(pre_delete, sender=Sponsorship)
+def load_sponsorship_state(sender, instance, **kwargs):
+    """Исходная сумма отложенных полей - из базы до изменения (как у комментариев)"""
+    if instance._loaded_amount is None:
+        row = Sponsorship.objects.filter(pk=instance.pk).values_list('amount', 'is_active').first()
+        instance._loaded_amount = row[0] if row and row[1] and row[0] else 0
+
+
+@receiver(post_save, sender=Sponsorship)
+def sponsorship_saved(sender, instance, **kwargs):
+    amount = _sponsorship_amount(instance)
+    change_counters(instance.pet_id, sponsorship_total=Decimal(amount) - Decimal(instance._loaded_amount))
+    instance._loaded_amount = amount
+
+
+@receiver(post_delete, sender=Sponsorship)
+def sponsorship_deleted(sender, instance, **kwargs):
+    change_counters(instance.pet_id, sponsorship_total=-Decimal(instance._loaded_amount))
+
+
+# Журнал изменений для ленты /api/changes/ (game.changes)
+
+@receiver(post_init, sender=Pet)
+def remember_adoption_state(sender, instance, **kwargs):
+    """Исходное is_adopted, чтобы отличить усыновление от обычного изменения"""
+    instance._loaded_is_adopted = instance.__dict__.get('is_adopted')
+
+
+@receiver(post_save, sender=Pet)
+def log_pet_change(sender, instance, created, **kwargs):
+    if created:
+        action = 'created'
+    elif instance.is_adopted and instance._loaded_is_adopted is False:
+        action = 'adopted'
+    else:
+        action = 'updated'
+    log_change(Pet, instance.pk, action)
+    instance._loaded_is_adopted = instance.is_adopted
+
+
+@receiver(post_init, sender=HappyStory)
+def remember_publication_state(sender, instance, **kwargs):
+    """Исходное is_published: API отдает только опубликованные истории"""
+    instance._loaded_is_published = instance.__dict__.get('is_published') if instance.pk else False
+
+
+@receiver(post_save, sender=HappyStory)
+def log_happy_story_change(sender, instance, created, **kwargs):
+    if instance.is_published:
+        action = 'created' if created or instance._loaded_is_published is False else 'updated'
+    elif instance._loaded_is_published is not False:
+        # Снята с публикации (или исходное состояние не загружено)
+        action = 'deleted'
+    else:
+        action = None
+    if action:
+        log_change(HappyStory, instance.pk, action)
+    instance._loaded_is_published = instance.is_published
+
+
+@receiver(post_delete, sender=Pet)
+@receiver(post_delete, sender=HappyStory)
+def log_deletion(sender, instance, **kwargs):
+    if sender is HappyStory and instance._loaded_is_published is False:
+        return
+    log_change(sender, instance.pk, 'deleted')
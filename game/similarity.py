@@ -0,0 +1,291 @@
+"""
+Похожие питомцы по описанию (content-based) - для новых питомцев, у которых
+еще нет избранного и заявок (ср. game.recommendations).
+
+Каждый питомец превращается в разреженный вектор признаков:
+
+* слова характера, истории и особенностей с весами TF-IDF (русские слова
+  приводятся к основе простым отсечением окончаний, стоп-слова отбрасываются);
+* тип питомца, возрастная группа и наличие особенностей - категориальные
+  признаки с фиксированным весом.
+
+Вектор нормируется, сходство - косинус (скалярное произведение). Слова
+образуют разреженную матрицу питомец x слово, и сходства считаются ее
+произведением на транспонированную блоками по BLOCK_SIZE питомцев (как в
+game.recommendations): кандидаты в соседи - питомцы с общими словами.
+Слова, которые встречаются больше чем у MAX_TERM_SHARE питомцев, ничего не
+говорят о сходстве, но делали бы кандидатами почти всех, поэтому
+отбрасываются. Вклад категорий (их у питомца всего три) добавляется к
+сходству кандидатов отдельно - иначе кандидатом был бы каждый питомец того
+же типа. Если общих слов почти ни с кем нет, кандидаты добираются из
+питомцев с теми же категориями. Результат хранится в PetNeighbor с
+source='content'.
+
+Команда build_content_similarity пересчитывает только питомцев, измененных
+после прошлого расчета (по Pet.updated_at), и вставляет их в списки
+соседей остальных, если они туда проходят: запоминаются только сходства
+выше худшего соседа в текущем списке. Веса IDF при этом немного устаревают,
+поэтому полный расчет (--full) стоит запускать периодически.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+import numpy as np
+from django.db.models import Max
+from scipy import sparse
+
+from .filters import age_bucket
+from .models import Pet, PetNeighbor
+from .recommendations import BLOCK_SIZE, NEIGHBORS_PER_PET, _top, save_neighbors
+
+
+WORD_RE = re.compile(r'[а-яёa-z]+')
+
+# Вес текста каждого поля в векторе
+FIELD_WEIGHTS = {
+    'character': 1.0,
+    'special_needs': 0.8,
+    'history': 0.5,
+}
+
+# Вес категориальных признаков относительно текста
+CATEGORY_WEIGHTS = {
+    'type': 1.0,
+    'age': 0.6,
+    'needs': 0.4,
+}
+
+# Слова, которые есть больше чем у такой доли питомцев, не учитываются;
+# в маленьком каталоге (до MIN_CAPPED_FREQUENCY питомцев со словом) - все
+MAX_TERM_SHARE = 0.1
+MIN_CAPPED_FREQUENCY = 20
+
+MIN_WORD_LENGTH = 3
+
+STOP_WORDS = frozenset('''
+    без более бы был была были было быть вам вас весь во вот все всего всех вы где да даже
+    для до его ее если есть еще же за здесь из или им их как когда кто ли либо мне может мы
+    на над нас не него нее нет ни них но ну об однако он она они оно от очень по под после
+    при про раз с сам со так также такой там те тем то того тоже только том тот тут ты уже
+    хотя чем что чтобы эта эти это этот очень любит
+'''.split())
+
+# Окончания, которые отсекаются при приведении слова к основе (от длинных к коротким)
+ENDINGS = sorted('''
+    ами ями ого его ому ему ыми ими ая яя ое ее ой ей ий ый ые ие ом ем ую юю ах ях ам ям
+    ов ев ию ия ья ье ью ть ти ться тся ет ит ют ят ешь ишь ем им а я о е ы и у ю ь й
+'''.split(), key=len, reverse=True)
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    """Грубая основа русского слова: отсекается самое длинное подходящее окончание"""
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_WORD_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    return [
+        stem(word) for word in WORD_RE.findall((text or '').lower().replace('ё', 'е'))
+        if len(word) >= MIN_WORD_LENGTH and word not in STOP_WORDS
+    ]
+
+
+def pet_terms(pet):
+    """Частоты признаков питомца (pet - словарь полей): {признак: вес без IDF}"""
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token, count in Counter(tokenize(pet[field])).items():
+            terms[f'{field}:{token}'] += weight * (1 + math.log(count))
+    return terms
+
+
+def pet_categories(pet):
+    """Категориальные признаки питомца в порядке CATEGORY_WEIGHTS"""
+    return (pet['pet_type_id'], age_bucket(pet['age']), bool(pet['special_needs']))
+
+
+class ContentVectors:
+    """
+    Нормированные векторы питомцев: разреженная матрица слов text (строка -
+    питомец из ids) и категории categories с весами category_weights
+    (массивы питомец x категория). Обе части поделены на общую норму вектора.
+    """
+
+    def __init__(self, pets):
+        self.ids = []
+        terms = []
+        categories = []
+        for pet in pets:
+            self.ids.append(pet['id'])
+            terms.append(pet_terms(pet))
+            categories.append(pet_categories(pet))
+        self.index = {pet_id: row for row, pet_id in enumerate(self.ids)}
+        total = len(self.ids)
+
+        document_frequency = Counter(term for counts in terms for term in counts)
+        cap = max(MAX_TERM_SHARE * total, MIN_CAPPED_FREQUENCY)
+        vocabulary = {}
+        for term, frequency in document_frequency.items():
+            if frequency <= cap:
+                vocabulary[term] = len(vocabulary)
+        rows, columns, data = [], [], []
+        for row, counts in enumerate(terms):
+            for term, weight in counts.items():
+                if term in vocabulary:
+                    rows.append(row)
+                    columns.append(vocabulary[term])
+                    data.append(weight * math.log((1 + total) / (1 + document_frequency[term])))
+        text = sparse.csr_matrix((data, (rows, columns)), shape=(total, len(vocabulary)))
+
+        # Текст и категории нормируются отдельно, чтобы длинная история не
+        # перевешивала тип и возраст; потом весь вектор - на общую норму
+        norms = np.sqrt(np.asarray(text.multiply(text).sum(axis=1))).ravel()
+        has_text = norms > 0
+        norms[~has_text] = 1
+        weights = np.array(list(CATEGORY_WEIGHTS.values()))
+        scale = 1 / np.sqrt(has_text + weights @ weights)
+        self.text = (sparse.diags(scale / norms) @ text).tocsr()
+        self.transposed = self.text.T.tocsr()
+        self.category_weights = np.outer(scale, weights)
+
+        # Категории - целые коды, одинаковые у питомцев с одинаковым значением
+        codes = [{} for _ in CATEGORY_WEIGHTS]
+        self.categories = np.array([
+            [column.setdefault(value, len(column)) for column, value in zip(codes, values)]
+            for values in categories
+        ], dtype=np.int64).reshape(total, len(CATEGORY_WEIGHTS))
+        self.groups = defaultdict(list)
+        for row, values in enumerate(map(tuple, self.categories)):
+            self.groups[values].append(row)
+
+    def scores(self, rows):
+        """
+        Сходства питомцев rows (номера строк) с питомцами, с которыми у них
+        есть общие слова: разреженная матрица len(rows) x всех питомцев
+        """
+        block = (self.text[rows] @ self.transposed).tocoo()
+        rows = np.asarray(rows)[block.row]
+        same = self.categories[rows] == self.categories[block.col]
+        data = block.data + (same * self.category_weights[rows] * self.category_weights[block.col]).sum(axis=1)
+        return sparse.csr_matrix((data, (block.row, block.col)), shape=block.shape)
+
+    def same_categories(self, row, exclude, count):
+        """До count питомцев с теми же категориями, что у row, не из exclude, и их сходства"""
+        others = [
+            other for other in self.groups[tuple(self.categories[row])]
+            if other != row and other not in exclude
+        ][:count]
+        return [(other, float(self.category_weights[row] @ self.category_weights[other])) for other in others]
+
+
+def _top_rows(vectors, columns, data, k):
+    if len(columns) > k:
+        best = np.argpartition(-data, k)[:k]
+        columns, data = columns[best], data[best]
+    return _top({vectors.ids[column]: float(score) for column, score in zip(columns, data)}, k)
+
+
+def neighbors_of(vectors, pet_ids, thresholds=None, k=NEIGHBORS_PER_PET):
+    """
+    Ближайшие соседи pet_ids и сходства {(a, b): сходство} остальных
+    питомцев a с b из pet_ids, которые проходят в список соседей a - выше
+    thresholds[a] (по умолчанию 0). Без thresholds сходства не собираются.
+    """
+    targets = [vectors.index[pet_id] for pet_id in pet_ids]
+    total = len(vectors.ids)
+    changed = np.zeros(total, dtype=bool)
+    changed[targets] = True
+    limits = np.zeros(total)
+    for pet_id, limit in (thresholds or {}).items():
+        if pet_id in vectors.index:
+            limits[vectors.index[pet_id]] = limit
+
+    neighbors = {}
+    similarities = {}
+    for start in range(0, len(targets), BLOCK_SIZE):
+        block = targets[start:start + BLOCK_SIZE]
+        scores = vectors.scores(block)
+        for offset, row in enumerate(block):
+            span = slice(scores.indptr[offset], scores.indptr[offset + 1])
+            columns, data = scores.indices[span], scores.data[span]
+            own = columns != row
+            columns, data = columns[own], data[own]
+            if len(columns) < k:
+                extra = vectors.same_categories(row, set(columns.tolist()), k - len(columns))
+                if extra:
+                    columns = np.concatenate([columns, [other for other, _ in extra]]).astype(columns.dtype)
+                    data = np.concatenate([data, [score for _, score in extra]])
+            neighbors[vectors.ids[row]] = _top_rows(vectors, columns, data, k)
+            if thresholds is None:
+                continue
+            entering = (data > limits[columns]) & ~changed[columns]
+            for column, score in zip(columns[entering], data[entering]):
+                similarities[(vectors.ids[column], vectors.ids[row])] = float(score)
+    return neighbors, similarities
+
+
+def current_neighbors(changed):
+    """Сохраненные списки соседей неизмененных питомцев {pet_id: {сосед: сходство}}"""
+    current = defaultdict(dict)
+    rows = PetNeighbor.objects.filter(source='content').values_list('pet_id', 'neighbor_id', 'score')
+    for pet_id, neighbor_id, score in rows.iterator(chunk_size=5000):
+        if pet_id not in changed:
+            current[pet_id][neighbor_id] = score
+    return current
+
+
+def merge_into_existing(changed, similarities, current, k=NEIGHBORS_PER_PET):
+    """
+    Новые списки соседей для неизмененных питомцев, в которые проходят
+    измененные или в которых они были: старые сходства с измененными
+    питомцами заменяются новыми.
+    """
+    entering = defaultdict(dict)
+    for (pet_id, changed_id), score in similarities.items():
+        entering[pet_id][changed_id] = score
+    affected = set(entering) | {pet_id for pet_id, old in current.items() if changed & old.keys()}
+
+    updated = {}
+    for pet_id in affected:
+        kept = {
+            neighbor_id: score for neighbor_id, score in current.get(pet_id, {}).items()
+            if neighbor_id not in changed
+        }
+        updated[pet_id] = _top({**kept, **entering[pet_id]}, k)
+    return updated
+
+
+def build_content_similarity(full=False):
+    """
+    Пересчитывает соседей по описанию; без full - только для питомцев,
+    измененных после прошлого расчета. Возвращает (питомцев, соседей).
+    """
+    stored = PetNeighbor.objects.filter(source='content')
+    last_built = stored.aggregate(last=Max('date_computed'))['last']
+    if not (full or last_built is None):
+        changed = set(Pet.objects.filter(updated_at__gt=last_built).values_list('id', flat=True))
+        if not changed:
+            return 0, 0
+    vectors = ContentVectors(
+        Pet.objects.values('id', 'character', 'history', 'special_needs', 'pet_type_id', 'age')
+        .iterator(chunk_size=2000)
+    )
+    if not vectors.ids:
+        return 0, 0
+
+    if full or last_built is None:
+        neighbors, _ = neighbors_of(vectors, vectors.ids)
+    else:
+        current = current_neighbors(changed)
+        # Сходство не выше худшего соседа в полном списке в него не попадет
+        thresholds = {
+            pet_id: min(old.values()) for pet_id, old in current.items() if len(old) >= NEIGHBORS_PER_PET
+        }
+        neighbors, similarities = neighbors_of(vectors, changed, thresholds)
+        neighbors.update(merge_into_existing(changed, similarities, current))
+    return len(neighbors), save_neighbors(neighbors, set(neighbors), source='content')
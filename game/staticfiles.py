@@ -0,0 +1,247 @@
+"""
+Сборка статики для продакшена (manage.py collectstatic).
+
+OptimizedStaticFilesStorage поверх ManifestStaticFilesStorage:
+
+* имена файлов с хешем содержимого (main.3f2a….css), поэтому статику можно
+  кешировать навсегда;
+* CSS и JS минифицируются (JS - через rjsmin, если он установлен);
+* рядом с каждым текстовым файлом кладутся сжатые копии .gz и .br (brotli -
+  если установлен пакет Brotli), их отдает nginx (gzip_static / brotli_static);
+* для каждой страницы из main.css выбираются правила, которые используются в
+  ее шаблоне, и сохраняются в critical/<шаблон>.css - тег {% page_css %}
+  встраивает их в страницу, а полный main.css грузится без блокировки отрисовки.
+"""
+import gzip
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.map')
+
+# Файлы меньше этого размера не сжимаются - выигрыша почти нет
+COMPRESS_MIN_SIZE = 256
+
+CRITICAL_DIR = 'critical'
+CRITICAL_SOURCE = 'css/main.css'
+
+# Встроенный CSS больше первого TCP-окна (~14 КБ) только замедлит отрисовку,
+# для таких страниц остается обычная ссылка на main.css
+CRITICAL_MAX_SIZE = 14 * 1024
+
+CSS_TOKEN_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/)', re.S)
+CSS_SPACES_RE = re.compile(r'\s+')
+CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+# Пробел перед двоеточием значим в селекторах (".a :hover"), после - нигде
+CSS_COLON_RE = re.compile(r':\s+')
+
+CLASS_ATTR_RE = re.compile(r'class\s*=\s*"([^"]*)"|class\s*=\s*\'([^\']*)\'')
+ID_ATTR_RE = re.compile(r'\bid\s*=\s*["\']([^"\']*)["\']')
+TEMPLATE_NAME_RE = re.compile(r'["\']([\w/.-]+\.html)["\']')
+INCLUDE_RE = re.compile(r'{%\s*(?:include|extends)\s+["\']([^"\']+)["\']')
+NAME_RE = re.compile(r'[A-Za-z_-][\w-]*')
+SELECTOR_CLASS_RE = re.compile(r'([.#])([A-Za-z_-][\w-]*)')
+PSEUDO_RE = re.compile(r'::?[\w-]+(\([^)]*\))?')
+KEYFRAMES_RE = re.compile(r'@(?:-\w+-)?keyframes\s+([\w-]+)')
+
+
+def minify_css(text):
+    """
+    Осторожная минификация CSS: убираются комментарии (кроме /*! … */),
+    лишние пробелы и последняя точка с запятой в блоке. Строки не трогаются.
+    """
+    parts = []
+    for index, part in enumerate(CSS_TOKEN_RE.split(text)):
+        if index % 2:
+            if part.startswith('/*'):
+                if part.startswith('/*!'):
+                    parts.append(part)
+                continue
+            parts.append(part)
+            continue
+        part = CSS_SPACES_RE.sub(' ', part)
+        part = CSS_PUNCTUATION_RE.sub(r'\1', part)
+        part = CSS_COLON_RE.sub(':', part)
+        parts.append(part.replace(';}', '}'))
+    return ''.join(parts).strip()
+
+
+def minify_js(text):
+    if rjsmin is None:
+        return text
+    return rjsmin.jsmin(text)
+
+
+def split_css_rules(text):
+    """
+    Разбивает CSS на правила верхнего уровня: список (prelude, body).
+    Для @media body - это вложенный CSS, для обычных правил - объявления.
+    """
+    rules = []
+    depth = 0
+    start = 0
+    prelude = None
+    for index, char in enumerate(text):
+        if char == '{':
+            if depth == 0:
+                prelude = text[start:index].strip()
+                start = index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((prelude, text[start:index]))
+                start = index + 1
+    return rules
+
+
+def selector_matches(selector, names):
+    """Все ли классы и id селектора встречаются на странице"""
+    selector = PSEUDO_RE.sub('', selector)
+    return all(name in names for _, name in SELECTOR_CLASS_RE.findall(selector))
+
+
+def critical_css(css, names):
+    """Правила из css, которые могут относиться к элементам с классами/id из names"""
+    selected = []
+    for prelude, body in split_css_rules(css):
+        if prelude.startswith('@media') or prelude.startswith('@supports'):
+            inner = critical_css(body, names)
+            if inner:
+                selected.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            # @keyframes и прочие at-правила добавляются ниже, если нужны
+            continue
+        elif any(selector_matches(selector, names) for selector in prelude.split(',')):
+            selected.append(f'{prelude}{{{body}}}')
+    result = ''.join(selected)
+
+    for prelude, body in split_css_rules(css):
+        match = KEYFRAMES_RE.match(prelude)
+        if match and re.search(rf'\b{re.escape(match.group(1))}\b', result):
+            result += f'{prelude}{{{body}}}'
+    return result
+
+
+def template_dirs():
+    dirs = []
+    for backend in settings.TEMPLATES:
+        dirs.extend(Path(path) for path in backend.get('DIRS', []))
+    return dirs
+
+
+def template_names(dirs):
+    """Имена используемых классов и id в шаблоне (с учетом include/extends)"""
+    def read(name, seen):
+        if name in seen:
+            return ''
+        seen.add(name)
+        for directory in dirs:
+            path = directory / name
+            if path.is_file():
+                source = path.read_text(encoding='utf-8')
+                included = [read(child, seen) for child in INCLUDE_RE.findall(source)]
+                return source + ''.join(included)
+        return ''
+
+    def names(source):
+        found = set()
+        for double, single in CLASS_ATTR_RE.findall(source):
+            found.update(NAME_RE.findall(double or single))
+        for value in ID_ATTR_RE.findall(source):
+            found.update(NAME_RE.findall(value))
+        return found
+
+    return read, names
+
+
+class OptimizedStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage с минификацией, сжатием и критическим CSS"""
+
+    def _save(self, name, content):
+        if name.endswith(('.css', '.js')):
+            # Содержимое уже могли прочитать для вычисления хеша
+            content.seek(0)
+            text = content.read().decode('utf-8')
+            text = minify_css(text) if name.endswith('.css') else minify_js(text)
+            content = ContentFile(text.encode('utf-8'))
+        return super()._save(name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        if CRITICAL_SOURCE in paths:
+            self.build_critical_css()
+        for name in list(self.hashed_files.values()) + list(paths):
+            self.compress(name)
+
+    def compress(self, name):
+        """Сохраняет рядом с файлом сжатые копии .gz и .br"""
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS) or not self.exists(name):
+            return
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        compressed = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['.br'] = brotli.compress(data, quality=11)
+        for extension, content in compressed.items():
+            if len(content) >= len(data):
+                continue
+            tmp_path = f'{path}{extension}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path + extension)
+
+    def build_critical_css(self):
+        """critical/<шаблон>.css для каждого шаблона проекта"""
+        with self.open(CRITICAL_SOURCE) as f:
+            css = minify_css(f.read().decode('utf-8'))
+
+        dirs = template_dirs()
+        read, names = template_names(dirs)
+        # Классы, которые выводят шаблонные теги приложения (в том числе
+        # через шаблоны inclusion-тегов)
+        tags_dir = Path(__file__).resolve().parent / 'templatetags'
+        tag_names = set()
+        for path in tags_dir.glob('*.py'):
+            code = path.read_text(encoding='utf-8')
+            tag_names |= names(code)
+            for template in TEMPLATE_NAME_RE.findall(code):
+                tag_names |= names(read(template, set()))
+
+        for directory in dirs:
+            for path in directory.rglob('*.html'):
+                template = path.relative_to(directory).as_posix()
+                source = read(template, set())
+                if 'page_css' not in source:
+                    continue
+                critical = critical_css(css, names(source) | tag_names)
+                name = critical_name(template)
+                if self.exists(name):
+                    self.delete(name)
+                if critical and len(critical.encode('utf-8')) <= CRITICAL_MAX_SIZE:
+                    # Не через self._save - CSS уже минифицирован
+                    super()._save(name, ContentFile(critical.encode('utf-8')))
+
+
+def critical_name(template_name):
+    return f'{CRITICAL_DIR}/{template_name}.css'
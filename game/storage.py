@@ -0,0 +1,82 @@
+"""
+Хранилище загруженных файлов с адресацией по содержимому.
+
+Файл сохраняется под именем из SHA-256 своего содержимого:
+"content/ab/cd/abcd…ef.jpg". Одинаковые загрузки (одно и то же фото у
+питомца и в счастливой истории, повторная загрузка) занимают место один раз,
+а имя файла никогда не меняет содержимое, поэтому URL можно кешировать
+навсегда (см. game.media.cache_control).
+"""
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.utils.deconstruct import deconstructible
+
+
+CONTENT_DIR = 'content'
+
+CONTENT_NAME_RE = re.compile(r'^[0-9a-f]{64}$')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_name(digest, extension):
+    """Имя в хранилище для файла с хешем digest"""
+    return f'{CONTENT_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def is_content_addressed(name):
+    stem, _ = os.path.splitext(os.path.basename(name))
+    return bool(CONTENT_NAME_RE.match(stem))
+
+
+def file_digest(fileobj):
+    """SHA-256 файла (объект читается с начала и возвращается в начало)"""
+    sha = hashlib.sha256()
+    if hasattr(fileobj, 'seek'):
+        fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b''):
+        sha.update(chunk)
+    if hasattr(fileobj, 'seek'):
+        fileobj.seek(0)
+    return sha.hexdigest()
+
+
+def path_digest(path):
+    with open(path, 'rb') as f:
+        return file_digest(f)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, который раскладывает файлы по хешу и не хранит дубли"""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        _, extension = os.path.splitext(name)
+        name = content_name(file_digest(content), extension)
+        validate_file_name(name, allow_relative_path=True)
+        if self.exists(name):
+            # Такой файл уже загружали - просто ссылаемся на него
+            return name
+        return self._save(name, content)
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        # Пишем во временный файл и атомарно переименовываем: при гонке двух
+        # одинаковых загрузок второй просто перезапишет файл тем же содержимым
+        tmp_name = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(tmp_name), self.path(name))
+        return name
+
+
+content_storage = ContentAddressedStorage()
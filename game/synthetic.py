@@ -0,0 +1,331 @@
+"""
+Синтетические данные для проверки масштабирования: типы, приюты, питомцы
+с фотографиями-заглушками, пользователи, избранное, комментарии,
+опекунство, заявки и счастливые истории.
+
+Строки вставляются bulk_create порциями по batch_size и не держатся в
+памяти целиком, поэтому можно создать десятки тысяч питомцев и миллионы
+строк избранного. bulk_create не вызывает сигналы, поэтому после вставки
+счетчики интереса сверяются с данными (game.counters), витрина PetCard
+пересобирается, а кеш страниц сбрасывается. Журнал изменений (ChangeLog)
+не пополняется - клиентам API после генерации нужна полная синхронизация.
+
+Распределение интереса неравномерное, как на живом сайте: немногие
+питомцы собирают большую часть избранного и заявок.
+"""
+import io
+import os
+import random
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.utils.text import capfirst
+from PIL import Image, ImageDraw
+
+from .cache import invalidate_tags, model_tag
+from .cards import rebuild_pet_cards
+from .counters import reconcile_counters
+from .images import process_image
+from .models import (
+    AdoptionApplication, Comment, Favorite, HappyStory, Pet, PetType, Shelter, Sponsorship,
+)
+from .storage import content_storage
+
+
+# Синтетические пользователи: synthetic_0, synthetic_1, ... с общим паролем
+USERNAME_PREFIX = 'synthetic_'
+PASSWORD = 'synthetic'
+
+PET_TYPES = ['Кошка', 'Собака', 'Кролик', 'Морская свинка', 'Попугай', 'Хорек']
+
+PET_NAMES = [
+    'Барсик', 'Мурка', 'Рыжик', 'Шарик', 'Бим', 'Дымка', 'Тиша', 'Луна', 'Граф', 'Соня',
+    'Пушок', 'Лаки', 'Бусинка', 'Тимофей', 'Ночка', 'Кузя', 'Веста', 'Марс', 'Снежок', 'Джек',
+]
+
+CHARACTER_TRAITS = [
+    'ласковый', 'игривый', 'спокойный', 'любопытный', 'осторожный', 'общительный',
+    'любит детей', 'ладит с другими животными', 'привыкает к людям не сразу',
+    'приучен к лотку', 'знает команды', 'любит долгие прогулки', 'обожает играть с мячиком',
+]
+
+HISTORIES = [
+    'Найден на улице зимой, долго лечился в приюте.',
+    'Остался без хозяев после переезда семьи.',
+    'Родился в приюте, людей знает с первых дней.',
+    'Передан в приют прежними владельцами из-за аллергии.',
+    'Подобран волонтерами возле трассы, был очень напуган.',
+]
+
+SPECIAL_NEEDS = [
+    'Нужна специальная диета.',
+    'Плохо видит на один глаз.',
+    'Нужен регулярный осмотр ветеринара.',
+    'Боится громких звуков.',
+]
+
+COMMENTS = [
+    'Какой красивый!', 'Надеюсь, скоро найдет дом.', 'Приезжали знакомиться, очень добрый.',
+    'Расскажите, как он ладит с кошками?', 'Сделали перевод на корм.', 'Чудесные фотографии!',
+]
+
+STORY_TEXTS = [
+    'Теперь живет в большом доме с садом и подружился с соседской собакой.',
+    'Быстро освоился на новом месте и спит только на хозяйской подушке.',
+    'Каждое утро встречает семью у двери и провожает детей в школу.',
+]
+
+APPLICATION_STATUSES = [('pending', 6), ('approved', 2), ('rejected', 1), ('completed', 1)]
+
+SPONSORSHIP_AMOUNTS = [300, 500, 1000, 1500, 3000, 5000]
+
+PLACEHOLDER_SIZE = (800, 600)
+
+
+def placeholder_images(count, rng):
+    """
+    Несколько однотонных фото-заглушек в хранилище (вместе с уменьшенными
+    копиями): [{'name', 'width', 'height', 'placeholder'}]. Питомцы
+    ссылаются на них совместно - хранилище адресовано по содержимому.
+    """
+    images = []
+    for index in range(count):
+        color = tuple(rng.randrange(60, 230) for _ in range(3))
+        image = Image.new('RGB', PLACEHOLDER_SIZE, color)
+        width, height = PLACEHOLDER_SIZE
+        ImageDraw.Draw(image).ellipse(
+            (width // 4, height // 5, width * 3 // 4, height * 4 // 5),
+            fill=tuple(255 - channel for channel in color),
+        )
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=80)
+        name = content_storage.save(f'synthetic_{index}.jpg', ContentFile(buffer.getvalue()))
+        metadata = process_image(content_storage.path(name))
+        images.append({
+            'name': os.path.relpath(metadata['path'], content_storage.location).replace(os.sep, '/'),
+            'width': metadata['width'],
+            'height': metadata['height'],
+            'placeholder': metadata['placeholder'],
+        })
+    return images
+
+
+def skewed_index(size, rng):
+    """Случайный индекс, тяготеющий к началу: первые питомцы популярнее остальных"""
+    return int(size * rng.random() ** 2)
+
+
+def amount_around(average, rng, limit):
+    """
+    Случайное количество со средним average (экспоненциальное распределение,
+    дробная часть округляется случайно, чтобы не занижать малые средние)
+    """
+    if average <= 0:
+        return 0
+    value = rng.expovariate(1 / average)
+    amount = int(value) + (rng.random() < value % 1)
+    return min(limit, amount)
+
+
+class SyntheticDataGenerator:
+    """
+    Генератор синтетических данных. Повторный запуск добавляет данные к уже
+    созданным: новые пользователи получают следующие номера.
+    """
+
+    def __init__(self, batch_size=5000, seed=None, log=None):
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.created = {}
+
+    def insert(self, model, rows):
+        """bulk_create порциями; rows - итератор, в памяти не больше одной порции"""
+        batch = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+            total += len(batch)
+        label = capfirst(model._meta.verbose_name_plural)
+        self.created[label] = self.created.get(label, 0) + total
+        self.log(f'{label}: {total}')
+        return total
+
+    def new_pks(self, model, last_pk):
+        return list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    def generate(self, pets, users, shelters=20, favorites_per_user=8, comments_per_pet=3,
+                 applications_per_user=0.3, sponsorships_per_user=0.2, adopted_share=0.15, images=12):
+        pet_types = [PetType.objects.get_or_create(name=name)[0].pk for name in PET_TYPES]
+        shelter_ids = self.generate_shelters(shelters)
+        photos = placeholder_images(images, self.rng)
+        pet_ids, adopted_ids = self.generate_pets(pets, pet_types, shelter_ids, photos, adopted_share)
+        user_ids = self.generate_users(users)
+        available = [pet_id for pet_id in pet_ids if pet_id not in adopted_ids]
+
+        self.generate_favorites(user_ids, pet_ids, favorites_per_user)
+        self.generate_comments(pet_ids, user_ids, comments_per_pet)
+        self.generate_sponsorships(user_ids, available, sponsorships_per_user)
+        self.generate_applications(user_ids, available, adopted_ids, applications_per_user)
+        self.generate_happy_stories(adopted_ids, photos)
+        self.finish()
+        return self.created
+
+    def generate_shelters(self, count):
+        start = Shelter.objects.count()
+        self.insert(Shelter, (
+            Shelter(
+                name=f'Приют №{number}', address=f'г. Москва, ул. Садовая, д. {number}',
+                phone=f'+7 900 000-{number:04d}'[:20], email=f'shelter{number}@example.com',
+                description='Частный приют для бездомных животных.',
+            )
+            for number in range(start + 1, start + count + 1)
+        ))
+        return list(Shelter.objects.values_list('pk', flat=True))
+
+    def generate_pets(self, count, pet_types, shelter_ids, photos, adopted_share):
+        rng = self.rng
+        last_pk = self.last_pk(Pet)
+
+        def rows():
+            for _ in range(count):
+                photo = rng.choice(photos)
+                traits = rng.sample(CHARACTER_TRAITS, rng.randint(2, 4))
+                yield Pet(
+                    name=rng.choice(PET_NAMES), age=rng.randint(1, 180),
+                    photo=photo['name'], photo_width=photo['width'], photo_height=photo['height'],
+                    photo_placeholder=photo['placeholder'],
+                    history=rng.choice(HISTORIES), character=', '.join(traits).capitalize() + '.',
+                    special_needs=rng.choice(SPECIAL_NEEDS) if rng.random() < 0.2 else '',
+                    is_adopted=rng.random() < adopted_share,
+                    pet_type_id=rng.choice(pet_types), shelter_id=rng.choice(shelter_ids),
+                )
+
+        self.insert(Pet, rows())
+        pet_ids = self.new_pks(Pet, last_pk)
+        adopted_ids = set(
+            Pet.objects.filter(pk__gt=last_pk, is_adopted=True).values_list('pk', flat=True)
+        )
+        return pet_ids, adopted_ids
+
+    def generate_users(self, count):
+        start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        last_pk = self.last_pk(User)
+        # Хеш пароля считается один раз: иначе 200 тысяч пользователей
+        # создавались бы часами
+        password = make_password(PASSWORD)
+        self.insert(User, (
+            User(username=f'{USERNAME_PREFIX}{number}', email=f'{USERNAME_PREFIX}{number}@example.com',
+                 password=password)
+            for number in range(start, start + count)
+        ))
+        return self.new_pks(User, last_pk)
+
+    def generate_favorites(self, user_ids, pet_ids, per_user):
+        rng = self.rng
+
+        def rows():
+            for user_id in user_ids:
+                chosen = {
+                    pet_ids[skewed_index(len(pet_ids), rng)]
+                    for _ in range(amount_around(per_user, rng, len(pet_ids)))
+                }
+                for pet_id in chosen:
+                    yield Favorite(user_id=user_id, pet_id=pet_id)
+
+        self.insert(Favorite, rows())
+
+    def generate_comments(self, pet_ids, user_ids, per_pet):
+        rng = self.rng
+
+        def rows():
+            for pet_id in pet_ids:
+                for _ in range(amount_around(per_pet, rng, 200)):
+                    yield Comment(
+                        pet_id=pet_id, user_id=rng.choice(user_ids), content=rng.choice(COMMENTS),
+                        is_approved=rng.random() < 0.95,
+                    )
+
+        self.insert(Comment, rows())
+
+    def generate_sponsorships(self, user_ids, pet_ids, per_user):
+        rng = self.rng
+        types = [code for code, label in Sponsorship.SPONSORSHIP_TYPES]
+
+        def rows():
+            for user_id in user_ids:
+                for _ in range(amount_around(per_user, rng, 10)):
+                    yield Sponsorship(
+                        user_id=user_id, pet_id=pet_ids[skewed_index(len(pet_ids), rng)],
+                        sponsorship_type=rng.choice(types), amount=rng.choice(SPONSORSHIP_AMOUNTS),
+                        is_active=rng.random() < 0.8,
+                    )
+
+        if pet_ids:
+            self.insert(Sponsorship, rows())
+
+    def generate_applications(self, user_ids, pet_ids, adopted_ids, per_user):
+        rng = self.rng
+        statuses, weights = zip(*APPLICATION_STATUSES)
+        adopted = list(adopted_ids)
+
+        def rows():
+            for user_id in user_ids:
+                chosen = {
+                    pet_ids[skewed_index(len(pet_ids), rng)]
+                    for _ in range(amount_around(per_user, rng, 20))
+                }
+                for pet_id in chosen:
+                    yield self.application(user_id, pet_id, rng.choices(statuses, weights)[0])
+            # У каждого усыновленного питомца - завершенная заявка будущего хозяина
+            for pet_id in adopted:
+                yield self.application(rng.choice(user_ids), pet_id, 'completed')
+
+        if pet_ids or adopted:
+            self.insert(AdoptionApplication, rows())
+
+    def application(self, user_id, pet_id, status):
+        return AdoptionApplication(
+            pet_id=pet_id, user_id=user_id, full_name=f'Пользователь {user_id}', phone='+7 900 000-00-00',
+            email=f'user{user_id}@example.com', address='г. Москва', housing_type=self.rng.choice(['Квартира', 'Дом']),
+            has_yard=self.rng.random() < 0.3, experience='Были животные в детстве',
+            motivation='Давно хотим завести питомца', work_schedule='5/2', family_members='2 взрослых',
+            status=status,
+        )
+
+    def generate_happy_stories(self, adopted_ids, photos):
+        rng = self.rng
+        today = date.today()
+
+        def rows():
+            for pet_id in adopted_ids:
+                photo = rng.choice(photos)
+                yield HappyStory(
+                    pet_id=pet_id, title='Нашел свой дом', story=rng.choice(STORY_TEXTS),
+                    new_owner_name=rng.choice(['Анна', 'Сергей', 'Мария', 'Олег']),
+                    adoption_date=today - timedelta(days=rng.randint(1, 1000)),
+                    photo_after=photo['name'], photo_after_width=photo['width'],
+                    photo_after_height=photo['height'], photo_after_placeholder=photo['placeholder'],
+                )
+
+        self.insert(HappyStory, rows())
+
+    def finish(self):
+        """То, что при обычном сохранении делают сигналы: счетчики, витрина, кеш"""
+        self.log('Сверка счетчиков интереса...')
+        reconcile_counters(self.batch_size)
+        self.log('Пересборка витрины карточек...')
+        rebuild_pet_cards(self.batch_size)
+        invalidate_tags(*(model_tag(model) for model in apps.get_app_config('game').get_models()))
@@ -0,0 +1,44 @@
+from functools import lru_cache
+
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from ..staticfiles import CRITICAL_SOURCE, OptimizedStaticFilesStorage, critical_name
+
+register = template.Library()
+
+
+@lru_cache(maxsize=None)
+def _critical_css(template_name):
+    """Критический CSS страницы из собранной статики ('' - если его нет)"""
+    name = critical_name(template_name)
+    if not staticfiles_storage.exists(name):
+        return ''
+    with staticfiles_storage.open(name) as f:
+        return f.read().decode('utf-8')
+
+
+@register.simple_tag(takes_context=True)
+def page_css(context):
+    """
+    Подключение main.css.
+
+    Если статика собрана с OptimizedStaticFilesStorage, стили страницы
+    встраиваются в <style>, а полный main.css загружается асинхронно.
+    Иначе - обычный <link rel="stylesheet">.
+    """
+    url = static(CRITICAL_SOURCE)
+    critical = ''
+    if isinstance(staticfiles_storage, OptimizedStaticFilesStorage) and context.template:
+        critical = _critical_css(context.template.name)
+    if not critical:
+        return format_html('<link rel="stylesheet" href="{}">', url)
+    return format_html(
+        '<style>{}</style>'
+        '<link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        mark_safe(critical.replace('</', '<\\/')), url, url
+    )
@@ -0,0 +1,90 @@
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from ..cache import KEY_PREFIX, cache_get_many, cache_set
+from ..cards import build_card
+from ..models import PetCard
+from .pet_images import PROCESSING_CLASS
+
+register = template.Library()
+
+CARD_VARIANTS = ('catalog', 'search', 'favorite', 'compare', 'application', 'similar')
+
+# Меняется вместе с разметкой includes/pet_card_body.html, чтобы после
+# выкладки не показывались карточки, закешированные старым шаблоном
+CARD_TEMPLATE_VERSION = 1
+
+# Ключ зависит от Pet.updated_at, поэтому записи не устаревают - только вытесняются
+CARD_TIMEOUT = 24 * 60 * 60
+
+# Тела карточек, загруженные {% prefetch_pet_cards %} для текущего шаблона
+PREFETCHED_KEY = 'pet_card_bodies'
+
+
+def card_key(pet, variant):
+    return f'{KEY_PREFIX}:card:{CARD_TEMPLATE_VERSION}:{pet.pk}:{pet.updated_at.timestamp()}:{variant}'
+
+
+def render_card_body(pet, variant, key):
+    card = pet if isinstance(pet, PetCard) else build_card(pet)
+    html = render_to_string('includes/pet_card_body.html', {'pet': pet, 'card': card, 'variant': variant})
+    # Заглушку обрабатываемого фото не кешируем: копии появятся без смены
+    # ключа, и карточка показывала бы заглушку до вытеснения
+    if PROCESSING_CLASS not in html:
+        cache_set(key, html, CARD_TIMEOUT)
+    return html
+
+
+def card_bodies(pets, variant):
+    """
+    Неизменная часть карточек: фото, кличка, тип, возраст, приют -
+    {pk: html}. Рендерится один раз на версию питомца и берется из кеша
+    одним запросом на все карточки. pets - питомцы или их карточки из
+    витрины PetCard.
+    """
+    keys = {card_key(pet, variant): pet for pet in pets}
+    found = cache_get_many(keys)
+    return {
+        pet.pk: mark_safe(found[key] if key in found else render_card_body(pet, variant, key))
+        for key, pet in keys.items()
+    }
+
+
+def card_body(pet, variant):
+    return card_bodies([pet], variant)[pet.pk]
+
+
+@register.simple_tag(takes_context=True)
+def prefetch_pet_cards(context, objects, variant='catalog', attr=None):
+    """
+    Загружает тела карточек списка до цикла, чтобы {% pet_card %} не ходил
+    в кеш за каждой: {% prefetch_pet_cards favorites 'favorite' attr='pet' %}.
+    attr - атрибут с питомцем, если в списке другие объекты.
+    """
+    pets = [getattr(obj, attr) for obj in objects] if attr else list(objects)
+    prefetched = context.render_context.setdefault(PREFETCHED_KEY, {})
+    for pk, body in card_bodies(pets, variant).items():
+        prefetched[pk, variant] = body
+    return ''
+
+
+@register.inclusion_tag('includes/pet_card.html', takes_context=True)
+def pet_card(context, pet, variant='catalog', favorite=None):
+    """
+    Карточка питомца. Вид задается variant (см. CARD_VARIANTS); состояние,
+    зависящее от пользователя (избранное), вычисляется при каждом выводе.
+    """
+    if variant not in CARD_VARIANTS:
+        raise template.TemplateSyntaxError(f'Неизвестный вид карточки: {variant}')
+    return {
+        'pet': pet,
+        'variant': variant,
+        'favorite': favorite,
+        'user': context.get('user'),
+        'is_favorite': pet.pk in context.get('favorite_pet_ids', ()),
+        'body': (
+            context.render_context.get(PREFETCHED_KEY, {}).get((pet.pk, variant))
+            or card_body(pet, variant)
+        ),
+    }
@@ -0,0 +1,81 @@
+from django import template
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from ..images import DERIVATIVE_WIDTHS, derivative_name, has_derivatives
+from ..jobs import is_processing
+
+register = template.Library()
+
+# Карточка в сетке занимает всю ширину экрана на телефоне и ~400px на десктопе
+DEFAULT_SIZES = '(max-width: 768px) 100vw, 400px'
+
+# Класс заглушки "Фото обрабатывается" (по нему game.templatetags.pet_cards
+# не кеширует карточку, пока фото в очереди); в разметке ниже он записан
+# буквально, чтобы его видел сборщик критического CSS
+PROCESSING_CLASS = 'photo-processing'
+
+
+def _derivatives_ready(image):
+    try:
+        return has_derivatives(image.path)
+    except (NotImplementedError, ValueError):
+        return False
+
+
+def _metadata(image):
+    """Размеры и превью, сохраненные на модели рядом с полем изображения"""
+    instance, name = image.instance, image.field.name
+    return (
+        getattr(instance, f'{name}_width', None),
+        getattr(instance, f'{name}_height', None),
+        getattr(instance, f'{name}_placeholder', ''),
+    )
+
+
+def _srcset(image, extension):
+    return ', '.join(
+        f'{image.storage.url(derivative_name(image.name, width, extension))} {width}w'
+        for width in DERIVATIVE_WIDTHS
+    )
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes=DEFAULT_SIZES, css_class='', fallback_width=640):
+    """
+    <picture> с WebP/JPEG копиями разных ширин для ImageField.
+
+    Пока фото в очереди на обработку, вместо тяжелого оригинала выводится
+    заглушка; если копий нет и задачи нет (старые фото, ошибка обработки) -
+    обычный <img> с оригиналом. Сохраненные размеры резервируют место под
+    фото, а крошечное превью служит фоном до загрузки.
+    """
+    if not image:
+        return ''
+    if not _derivatives_ready(image):
+        if is_processing(image.instance, image.field.name):
+            return format_html(
+                '<div class="no-photo photo-processing {}"><span>⏳ Фото обрабатывается</span></div>',
+                css_class
+            )
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            image.url, alt, css_class
+        )
+    fallback = image.storage.url(derivative_name(image.name, fallback_width, 'jpg'))
+    width, height, placeholder = _metadata(image)
+    extra = mark_safe('')
+    if width and height:
+        extra = format_html(' width="{}" height="{}"', width, height)
+    if placeholder:
+        extra += format_html(
+            ' style="background: url({}) center / cover no-repeat"', placeholder
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}"{} loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(image, 'webp'), sizes,
+        fallback, _srcset(image, 'jpg'), sizes, alt, css_class, extra
+    )
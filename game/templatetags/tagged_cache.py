@@ -0,0 +1,43 @@
+from django import template
+
+from ..cache import get_or_set
+
+register = template.Library()
+
+
+class TaggedCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, tags, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.tags = tags
+        self.vary_on = vary_on
+
+    def render(self, context):
+        tags = [tag.strip() for tag in self.tags.resolve(context).split(',') if tag.strip()]
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return get_or_set(
+            'fragment', self.fragment_name, tags,
+            lambda: self.nodelist.render(context), vary_on=vary_on
+        )
+
+
+@register.tag('tagged_cache')
+def do_tagged_cache(parser, token):
+    """
+    Кеширует фрагмент шаблона до изменения моделей из списка тегов:
+
+        {% tagged_cache "faq" "game.faq" [vary_on ...] %} ... {% endtagged_cache %}
+    """
+    nodelist = parser.parse(('endtagged_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает имя фрагмента, теги и необязательные vary_on"
+        )
+    return TaggedCacheNode(
+        nodelist,
+        bits[1].strip('"\''),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
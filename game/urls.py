@@ -1,18 +1,22 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
+from . import api
 from .views import (
-    PetListView, PetDetailView, help_info_view, test,
+    PetListView, PetListBatchView, PetDetailView, PetSearchView, help_info_view, test,
     add_to_favorites, remove_from_favorites, favorites_list,
     sponsor_pet, compare_pets, HappyStoriesListView, 
     HappyStoryDetailView, faq_view, toggle_favorite_ajax,
-    signup_view, add_comment, delete_comment,
+    sync_favorites_ajax, signup_view, add_comment, delete_comment, pet_comments,
     adoption_application, my_applications
 )
 
 urlpatterns = [
     # Основные страницы
     path('', PetListView.as_view(), name='pet_list'),
+    path('pets/batch/', PetListBatchView.as_view(), name='pet_list_batch'),
     path('pet/<int:pk>/', PetDetailView.as_view(), name='pet_detail'),
+    path('pet/<int:pk>/comments/', pet_comments, name='pet_comments'),
+    path('search/', PetSearchView.as_view(), name='pet_search'),
     path('help/', help_info_view, name='help_info'),
     path('test/', test, name="main_page"),
     
@@ -26,6 +30,7 @@ urlpatterns = [
     path('favorites/add/<int:pet_id>/', add_to_favorites, name='add_to_favorites'),
     path('favorites/remove/<int:pet_id>/', remove_from_favorites, name='remove_from_favorites'),
     path('ajax/favorite/<int:pet_id>/', toggle_favorite_ajax, name='toggle_favorite_ajax'),
+    path('ajax/favorites/sync/', sync_favorites_ajax, name='sync_favorites_ajax'),
     
     # Спонсорство
     path('sponsor/<int:pet_id>/', sponsor_pet, name='sponsor_pet'),
@@ -47,4 +52,12 @@ urlpatterns = [
     # Заявки на усыновление
     path('adopt/<int:pet_id>/', adoption_application, name='adoption_application'),
     path('my-applications/', my_applications, name='my_applications'),
+    
+    # JSON API (только чтение)
+    path('api/pets/', api.pet_list, name='api_pet_list'),
+    path('api/pets/<int:pk>/', api.pet_detail, name='api_pet_detail'),
+    path('api/shelters/', api.shelter_list, name='api_shelter_list'),
+    path('api/happy-stories/', api.happy_story_list, name='api_happy_story_list'),
+    path('api/happy-stories/<int:pk>/', api.happy_story_detail, name='api_happy_story_detail'),
+    path('api/changes/', api.change_feed, name='api_changes'),
 ]
\ No newline at end of file
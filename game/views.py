@@ -1,73 +1,203 @@
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import views as auth_views, login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Q
-from .models import (Pet, HelpInfo, Favorite, Sponsorship, 
+from django.http import JsonResponse, Http404
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
+from django.views.decorators.http import require_POST
+from .models import (Pet, PetCard, HelpInfo, Favorite, Sponsorship, 
                      HappyStory, FAQ, PetComparison, Comment, AdoptionApplication, PaymentInfo)
-from .forms import CommentForm, AdoptionApplicationForm
-
-
-class PetListView(ListView):
-    """Главная страница со списком питомцев"""
-    model = Pet
-    template_name = 'pets/pet_list.html'
+from .forms import CommentForm, AdoptionApplicationForm, PetFilterForm
+from .pagination import KeysetPaginator, InvalidCursor
+from .filters import filter_pets, facet_counts, SORT_OPTIONS, SPECIAL_NEEDS_CHOICES, INTEREST_CHOICES
+from .search import search_pets
+from .cache import cache_page_by_tags
+from .counters import COUNTERS_TAG
+from .favorites import favorite_pet_ids_among, favorites_counts, set_favorite
+from .recommendations import similar_pets, similar_to_pets
+
+
+# Теги кеша (game.cache): страница сбрасывается при изменении этих моделей
+PET_CATALOG_TAGS = ('game.pet', 'game.pettype', 'game.shelter', COUNTERS_TAG)
+HAPPY_STORY_TAGS = ('game.happystory', 'game.pet', 'game.pettype', 'game.shelter')
+
+
+class PetCatalogMixin:
+    """
+    Выборка каталога из витрины PetCard: фильтры и сортировка из строки
+    запроса, пагинация по курсору, избранное пользователя среди показанных
+    """
+    model = PetCard
     context_object_name = 'pets'
     paginate_by = 12
+    paginator_class = KeysetPaginator
+    
+    @cached_property
+    def filter_params(self):
+        """Параметры фильтрации и сортировки из строки запроса"""
+        return PetFilterForm(self.request.GET).get_params()
+    
+    def get_base_queryset(self):
+        return PetCard.objects.filter(is_adopted=False)
     
     def get_queryset(self):
-        return Pet.objects.filter(is_adopted=False).select_related('pet_type', 'shelter')
+        return filter_pets(self.get_base_queryset(), self.filter_params)
+    
+    def get_ordering(self):
+        label, ordering = SORT_OPTIONS[self.filter_params['sort']]
+        return ordering
+    
+    def paginate_queryset(self, queryset, page_size):
+        """Пагинация по курсору вместо OFFSET + COUNT(*)"""
+        paginator = self.paginator_class(queryset, page_size, ordering=self.get_ordering())
+        try:
+            page = paginator.get_page(self.request.GET.get('cursor'))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            # Получаем список ID избранных питомцев для текущего пользователя
-            favorite_pet_ids = Favorite.objects.filter(
-                user=self.request.user
-            ).values_list('pet_id', flat=True)
-            context['favorite_pet_ids'] = list(favorite_pet_ids)
-        else:
-            context['favorite_pet_ids'] = []
+        context['favorite_pet_ids'] = self.get_favorite_pet_ids(context['pets'])
+        return context
+    
+    def get_favorite_pet_ids(self, pets):
+        """Избранные питомцы текущего пользователя среди показанных (множество)"""
+        return favorite_pet_ids_among(self.request.user, [pet.pk for pet in pets])
+
+
+@method_decorator(cache_page_by_tags(*PET_CATALOG_TAGS), name='dispatch')
+class PetListView(PetCatalogMixin, ListView):
+    """Главная страница со списком питомцев (из витрины PetCard)"""
+    template_name = 'pets/pet_list.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['filter_params'] = self.filter_params
+        context['facets'] = facet_counts(self.get_base_queryset(), self.filter_params)
+        context['sort_options'] = [(code, label) for code, (label, ordering) in SORT_OPTIONS.items()]
+        context['special_needs_choices'] = SPECIAL_NEEDS_CHOICES
+        context['interest_choices'] = INTEREST_CHOICES
         return context
 
 
+@method_decorator(cache_page_by_tags(*PET_CATALOG_TAGS), name='dispatch')
+class PetListBatchView(PetCatalogMixin, ListView):
+    """
+    Следующая порция карточек каталога для бесконечной прокрутки: только
+    HTML карточек и адрес следующей порции, без фильтров, фасетов и обвязки
+    страницы. Параметры те же, что у PetListView.
+    """
+    template_name = 'pets/pet_list_batch.html'
+
+
+COMMENTS_PER_PAGE = 20
+
+
+def comment_page(pet_id, cursor=None):
+    """Порция одобренных комментариев питомца, сначала новые"""
+    comments = Comment.objects.filter(pet_id=pet_id, is_approved=True).select_related('user')
+    paginator = KeysetPaginator(comments, COMMENTS_PER_PAGE, ordering=('-date_created', '-id'))
+    try:
+        return paginator.get_page(cursor)
+    except InvalidCursor as e:
+        raise Http404(str(e))
+
+
+def pet_with_user_state(user):
+    """
+    Питомцы с типом, приютом и состоянием для пользователя (в избранном ли,
+    последняя заявка) - страница питомца получает все это одним запросом.
+    """
+    queryset = Pet.objects.select_related('pet_type', 'shelter')
+    if user.is_authenticated:
+        applications = AdoptionApplication.objects.filter(
+            pet=OuterRef('pk'), user=user
+        ).order_by('-date_created')
+        queryset = queryset.annotate(
+            user_is_favorite=Exists(Favorite.objects.filter(pet=OuterRef('pk'), user=user)),
+            user_application_id=Subquery(applications.values('pk')[:1]),
+            user_application_status=Subquery(applications.values('status')[:1]),
+            user_application_date=Subquery(applications.values('date_created')[:1]),
+        )
+    return queryset
+
+
+def user_application(pet):
+    """Заявка пользователя из аннотаций pet_with_user_state (None - заявки нет)"""
+    if getattr(pet, 'user_application_id', None) is None:
+        return None
+    return AdoptionApplication(
+        pk=pet.user_application_id,
+        pet=pet,
+        status=pet.user_application_status,
+        date_created=pet.user_application_date,
+    )
+
+
+def pet_comments(request, pk):
+    """Следующая порция комментариев питомца (HTML-фрагмент для "Показать еще")"""
+    if not Pet.objects.filter(pk=pk).exists():
+        raise Http404('Питомец не найден')
+    return render(request, 'pets/comment_batch.html', {
+        'pet_id': pk,
+        'comments_page': comment_page(pk, request.GET.get('cursor')),
+    })
+
+
 class PetDetailView(DetailView):
     """Страница отдельного питомца"""
     model = Pet
     template_name = 'pets/pet_detail.html'
     context_object_name = 'pet'
     
+    def get_queryset(self):
+        return pet_with_user_state(self.request.user)
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            # Проверяем, есть ли питомец в избранном у текущего пользователя
-            context['is_favorite'] = Favorite.objects.filter(
-                user=self.request.user, 
-                pet=self.object
-            ).exists()
-        else:
-            context['is_favorite'] = False
+        # В избранном ли питомец и заявка пользователя - из аннотаций
+        context['is_favorite'] = getattr(self.object, 'user_is_favorite', False)
         
-        # Добавляем комментарии и форму
-        context['comments'] = Comment.objects.filter(
-            pet=self.object, 
-            is_approved=True
-        ).select_related('user')
+        # Первая порция комментариев (или порция по курсору, если открыта
+        # ссылка "Показать еще" без JavaScript) и их число из счетчика питомца
+        context['comments_page'] = comment_page(self.object.pk, self.request.GET.get('comments_cursor'))
+        context['comments_count'] = self.object.comments_count
+        context['similar_pets'] = similar_pets(self.object)
         
         if self.request.user.is_authenticated:
             context['comment_form'] = CommentForm()
-            
-            # Проверяем, подавал ли пользователь заявку на этого питомца
-            context['user_application'] = AdoptionApplication.objects.filter(
-                pet=self.object, user=self.request.user
-            ).first()
+            context['user_application'] = user_application(self.object)
         
         return context
 
 
+class PetSearchView(ListView):
+    """Полнотекстовый поиск по питомцам"""
+    model = Pet
+    template_name = 'pets/search.html'
+    context_object_name = 'pets'
+    paginate_by = 12
+    
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        queryset = Pet.objects.filter(is_adopted=False).select_related('pet_type', 'shelter')
+        return search_pets(self.query, queryset).order_by('-rank', '-id')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        return context
+
+
+@cache_page_by_tags('game.helpinfo', 'game.paymentinfo')
 def help_info_view(request):
     """Страница 'Как помочь приюту?'"""
     help_items = HelpInfo.objects.filter(is_active=True)
@@ -115,7 +245,7 @@ def remove_from_favorites(request, pet_id):
 @login_required
 def favorites_list(request):
     """Список избранных питомцев"""
-    favorites = Favorite.objects.filter(user=request.user).select_related('pet')
+    favorites = Favorite.objects.filter(user=request.user).select_related('pet__pet_type', 'pet__shelter')
     return render(request, 'pets/favorites.html', {'favorites': favorites})
 
 
@@ -123,7 +253,7 @@ def favorites_list(request):
 @login_required
 def sponsor_pet(request, pet_id):
     """Страница спонсорства питомца"""
-    pet = get_object_or_404(Pet, id=pet_id)
+    pet = get_object_or_404(Pet.objects.select_related('pet_type', 'shelter'), id=pet_id)
     
     if request.method == 'POST':
         sponsorship_type = request.POST.get('sponsorship_type')
@@ -148,16 +278,20 @@ def sponsor_pet(request, pet_id):
 def compare_pets(request):
     """Страница сравнения питомцев"""
     pet_ids = request.GET.getlist('pets')
-    pets = Pet.objects.filter(id__in=pet_ids, is_adopted=False)
+    pets = Pet.objects.filter(id__in=pet_ids, is_adopted=False).select_related('pet_type', 'shelter')
     
     if len(pets) < 2:
         messages.error(request, 'Выберите минимум 2 питомцев для сравнения!')
         return redirect('pet_list')
     
-    return render(request, 'pets/compare.html', {'pets': pets})
+    return render(request, 'pets/compare.html', {
+        'pets': pets,
+        'similar_pets': similar_to_pets([pet.pk for pet in pets]),
+    })
 
 
 # Счастливые истории
+@method_decorator(cache_page_by_tags(*HAPPY_STORY_TAGS), name='dispatch')
 class HappyStoriesListView(ListView):
     """Список счастливых историй"""
     model = HappyStory
@@ -166,47 +300,97 @@ class HappyStoriesListView(ListView):
     paginate_by = 6
     
     def get_queryset(self):
-        return HappyStory.objects.filter(is_published=True)
+        return HappyStory.objects.filter(is_published=True).select_related('pet')
 
 
+@method_decorator(cache_page_by_tags(*HAPPY_STORY_TAGS), name='dispatch')
 class HappyStoryDetailView(DetailView):
     """Детали счастливой истории"""
     model = HappyStory
     template_name = 'pets/happy_story_detail.html'
     context_object_name = 'story'
+    queryset = HappyStory.objects.select_related('pet__pet_type', 'pet__shelter')
 
 
 # FAQ
+@cache_page_by_tags('game.faq')
 def faq_view(request):
     """Страница FAQ"""
-    faqs = FAQ.objects.filter(is_active=True)
-    categories = faqs.values_list('category', flat=True).distinct()
-    
-    faq_by_category = {}
-    for category in categories:
-        faq_by_category[category] = faqs.filter(category=category)
-    
-    return render(request, 'pets/faq.html', {'faq_by_category': faq_by_category})
+    # Группировка по категориям в шаблоне ({% regroup %}): запрос выполнится
+    # только если фрагмент не найден в кеше
+    faqs = FAQ.objects.filter(is_active=True).order_by('category', 'order')
+    return render(request, 'pets/faq.html', {'faqs': faqs})
 
 
 # AJAX для избранного
 @login_required
+@require_POST
 def toggle_favorite_ajax(request, pet_id):
-    """AJAX переключение избранного"""
-    pet = get_object_or_404(Pet, id=pet_id)
-    favorite, created = Favorite.objects.get_or_create(user=request.user, pet=pet)
+    """
+    AJAX изменение избранного. Тело: {"is_favorite": true} - нужное
+    состояние, а не переключение, поэтому повторный клик или повтор запроса
+    после обрыва связи не возвращают питомца обратно.
+    """
+    try:
+        is_favorite = json.loads(request.body)['is_favorite']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Неверный формат запроса'}, status=400)
+    if not isinstance(is_favorite, bool):
+        return JsonResponse({'error': 'Неверный формат запроса'}, status=400)
+    pet_name = Pet.objects.filter(id=pet_id).values_list('name', flat=True).first()
+    if pet_name is None:
+        raise Http404('Питомец не найден')
     
-    if not created:
-        favorite.delete()
-        is_favorite = False
-        message = f'{pet.name} удален из избранного'
+    set_favorite(request.user, pet_id, is_favorite)
+    if is_favorite:
+        message = f'{pet_name} добавлен в избранное'
     else:
-        is_favorite = True
-        message = f'{pet.name} добавлен в избранное'
+        message = f'{pet_name} удален из избранного'
     
     return JsonResponse({
         'is_favorite': is_favorite,
-        'message': message
+        'message': message,
+        'favorites_count': favorites_counts([pet_id]).get(pet_id, 0),
+    })
+
+
+# Сколько изменений избранного можно прислать одним запросом
+FAVORITES_SYNC_MAX = 100
+
+
+@login_required
+@require_POST
+def sync_favorites_ajax(request):
+    """
+    Применяет накопленные на клиенте изменения избранного одним запросом
+    (например, сделанные без сети в мобильном браузере).
+    
+    Тело: {"changes": [{"pet": 5, "is_favorite": true}, ...]} - нужное
+    состояние, а не переключение, поэтому повтор запроса после обрыва связи
+    ничего не ломает. Для одного питомца действует последнее изменение.
+    """
+    try:
+        changes = json.loads(request.body)['changes']
+        states = {int(change['pet']): change['is_favorite'] for change in changes}
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Неверный формат запроса'}, status=400)
+    if not all(isinstance(is_favorite, bool) for is_favorite in states.values()):
+        return JsonResponse({'error': 'Неверный формат запроса'}, status=400)
+    if len(states) > FAVORITES_SYNC_MAX:
+        return JsonResponse({'error': f'Не больше {FAVORITES_SYNC_MAX} питомцев за запрос'}, status=400)
+    
+    existing = set(Pet.objects.filter(pk__in=states).values_list('pk', flat=True))
+    with transaction.atomic():
+        for pet_id in existing:
+            set_favorite(request.user, pet_id, states[pet_id])
+    
+    counts = favorites_counts(existing)
+    return JsonResponse({
+        'results': [
+            {'pet': pet_id, 'is_favorite': states[pet_id], 'favorites_count': counts.get(pet_id, 0)}
+            for pet_id in states if pet_id in existing
+        ],
+        'missing': [pet_id for pet_id in states if pet_id not in existing],
     })
 
 
@@ -265,12 +449,9 @@ def delete_comment(request, comment_id):
 @login_required
 def adoption_application(request, pet_id):
     """Страница подачи заявки на усыновление"""
-    pet = get_object_or_404(Pet, id=pet_id)
-    
-    # Проверяем, не подавал ли пользователь уже заявку на этого питомца
-    existing_application = AdoptionApplication.objects.filter(
-        pet=pet, user=request.user
-    ).first()
+    # Питомец вместе с заявкой пользователя на него, если она уже есть
+    pet = get_object_or_404(pet_with_user_state(request.user), id=pet_id)
+    existing_application = user_application(pet)
     
     if existing_application:
         messages.info(request, f'Вы уже подали заявку на {pet.name}. Статус: {existing_application.get_status_display()}')
@@ -299,7 +480,7 @@ def my_applications(request):
     """Список заявок пользователя"""
     applications = AdoptionApplication.objects.filter(
         user=request.user
-    ).select_related('pet').order_by('-date_created')
+    ).select_related('pet__pet_type', 'pet__shelter').order_by('-date_created')
     
     return render(request, 'pets/my_applications.html', {
         'applications': applications
@@ -52,6 +52,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Первым из работающих с базой, чтобы учитывать запросы всех остальных
+    'game.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -134,11 +136,61 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Хешированные имена, минификация, .gz/.br копии и критический CSS страниц
+# (см. game/staticfiles.py). Требует manage.py collectstatic перед запуском.
+STATICFILES_OPTIMIZE = config('STATICFILES_OPTIMIZE', default=not DEBUG, cast=bool)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'game.staticfiles.OptimizedStaticFilesStorage' if STATICFILES_OPTIMIZE
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
 
 # Media files (uploaded images)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Отдача медиафайлов через фронтовой прокси (см. game/media.py):
+# для nginx - префикс internal-location, для Apache/lighttpd - X-Sendfile
+MEDIA_X_ACCEL_REDIRECT_PREFIX = config('MEDIA_X_ACCEL_REDIRECT_PREFIX', default='')
+MEDIA_X_SENDFILE = config('MEDIA_X_SENDFILE', default=False, cast=bool)
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=3600, cast=int)
+
+# Обработка загруженных фото: True - через очередь (manage.py process_image_jobs),
+# False - сразу при сохранении (удобно для локальной разработки без воркера)
+IMAGE_PROCESSING_ASYNC = config('IMAGE_PROCESSING_ASYNC', default=True, cast=bool)
+
+# Кеш: по умолчанию в памяти процесса, в продакшене - общий для всех воркеров,
+# например CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# и CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Кеш страниц и фрагментов с инвалидацией по тегам (см. game/cache.py)
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=600, cast=int)
+PAGE_CACHE_LOCAL_SIZE = config('PAGE_CACHE_LOCAL_SIZE', default=200, cast=int)
+# Насколько (секунд) каталог может отставать от счетчиков интереса (game/counters.py)
+COUNTERS_CACHE_INTERVAL = config('COUNTERS_CACHE_INTERVAL', default=30, cast=int)
+
+# Бюджет запросов к базе на HTTP-запрос (см. game/middleware.py): превышение
+# и повторы одного запроса (N+1) пишутся в лог game.queries
+QUERY_BUDGET = config('QUERY_BUDGET', default=50, cast=int)
+QUERY_TIME_BUDGET_MS = config('QUERY_TIME_BUDGET_MS', default=300, cast=int)
+QUERY_REPEAT_THRESHOLD = config('QUERY_REPEAT_THRESHOLD', default=10, cast=int)
+QUERY_SERVER_TIMING = config('QUERY_SERVER_TIMING', default=DEBUG, cast=bool)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
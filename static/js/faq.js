@@ -0,0 +1,55 @@
+// Аккордеон для FAQ
+const faqQuestions = document.querySelectorAll('.faq-question');
+
+faqQuestions.forEach(question => {
+    question.addEventListener('click', function() {
+        const answer = this.nextElementSibling;
+        const isActive = this.classList.contains('active');
+
+        // Закрываем все открытые вопросы
+        faqQuestions.forEach(q => {
+            q.classList.remove('active');
+            q.nextElementSibling.classList.remove('active');
+        });
+
+        // Открываем текущий, если он не был активен
+        if (!isActive) {
+            this.classList.add('active');
+            answer.classList.add('active');
+        }
+    });
+});
+
+// Поиск по FAQ
+const searchInput = document.getElementById('faq-search');
+const faqItems = document.querySelectorAll('.faq-item');
+
+searchInput.addEventListener('input', function() {
+    const searchTerm = this.value.toLowerCase();
+
+    faqItems.forEach(item => {
+        const question = item.querySelector('.faq-question');
+        const answer = item.querySelector('.faq-answer-content');
+        const questionText = question.textContent.toLowerCase();
+        const answerText = answer.textContent.toLowerCase();
+
+        if (questionText.includes(searchTerm) || answerText.includes(searchTerm)) {
+            item.style.display = 'block';
+
+            // Подсвечиваем найденные результаты
+            if (searchTerm && questionText.includes(searchTerm)) {
+                question.classList.add('active');
+                answer.classList.add('active');
+            }
+        } else {
+            item.style.display = 'none';
+        }
+    });
+
+    // Показываем/скрываем категории
+    const categories = document.querySelectorAll('.faq-category');
+    categories.forEach(category => {
+        const visibleItems = category.querySelectorAll('.faq-item[style="display: block"], .faq-item:not([style])');
+        category.style.display = visibleItems.length > 0 ? 'block' : 'none';
+    });
+});
@@ -0,0 +1,18 @@
+function copyToClipboard(text, message) {
+    navigator.clipboard.writeText(text).then(function() {
+        alert(message);
+    }).catch(function() {
+        // Fallback для старых браузеров
+        const textArea = document.createElement('textarea');
+        textArea.value = text;
+        document.body.appendChild(textArea);
+        textArea.select();
+        document.execCommand('copy');
+        document.body.removeChild(textArea);
+        alert(message);
+    });
+}
+
+function copyPaymentInfo(text, message) {
+    copyToClipboard(text, message);
+}
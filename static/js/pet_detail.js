@@ -0,0 +1,31 @@
+// Подгрузка комментариев порциями: "Показать еще" заменяется следующей
+// порцией без перезагрузки страницы (без JavaScript ссылка открывает
+// страницу с этой порцией)
+const commentsList = document.querySelector('.comments-list');
+
+if (commentsList) {
+    commentsList.addEventListener('click', function(e) {
+        const link = e.target.closest('.comments-more');
+        if (!link || link.classList.contains('loading')) {
+            return;
+        }
+        e.preventDefault();
+        link.classList.add('loading');
+
+        fetch(link.dataset.url, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.text();
+            })
+            .then(html => {
+                const batch = document.createElement('template');
+                batch.innerHTML = html;
+                link.replaceWith(batch.content);
+            })
+            .catch(() => {
+                window.location.href = link.href;
+            });
+    });
+}
@@ -0,0 +1,228 @@
+// Функционал сравнения питомцев
+const petsGrid = document.querySelector('.pets-grid');
+const comparePanel = document.getElementById('compare-panel');
+const compareCount = document.getElementById('compare-count');
+const compareBtn = document.getElementById('compare-btn');
+const clearCompareBtn = document.getElementById('clear-compare');
+
+let selectedPets = [];
+
+// Обработчики вешаются на сетку, а не на карточки: карточки подгружаются при прокрутке
+if (petsGrid) {
+    petsGrid.addEventListener('change', function(e) {
+        const checkbox = e.target.closest('.compare-checkbox');
+        if (!checkbox) {
+            return;
+        }
+        const petId = checkbox.value;
+
+        if (checkbox.checked) {
+            if (selectedPets.length < 3) {
+                selectedPets.push(petId);
+            } else {
+                checkbox.checked = false;
+                alert('Можно сравнить максимум 3 питомцев');
+                return;
+            }
+        } else {
+            selectedPets = selectedPets.filter(id => id !== petId);
+        }
+
+        updateComparePanel();
+    });
+}
+
+function updateComparePanel() {
+    compareCount.textContent = selectedPets.length;
+
+    if (selectedPets.length > 0) {
+        comparePanel.style.display = 'block';
+        compareBtn.disabled = selectedPets.length < 2;
+    } else {
+        comparePanel.style.display = 'none';
+    }
+}
+
+compareBtn.addEventListener('click', function() {
+    if (selectedPets.length >= 2) {
+        const params = selectedPets.map(id => `pets=${id}`).join('&');
+        window.location.href = `/compare/?${params}`;
+    }
+});
+
+clearCompareBtn.addEventListener('click', function() {
+    selectedPets = [];
+    document.querySelectorAll('.compare-checkbox').forEach(cb => cb.checked = false);
+    updateComparePanel();
+});
+
+// Функционал избранного
+const csrfMeta = document.querySelector('meta[name="csrf-token"]');
+
+// Изменения, которые не удалось отправить (нет сети), копятся в localStorage
+// и отправляются одним запросом, когда связь появится
+const FAVORITES_QUEUE_KEY = 'favoritesQueue';
+
+function readFavoritesQueue() {
+    try {
+        return JSON.parse(localStorage.getItem(FAVORITES_QUEUE_KEY)) || {};
+    } catch (e) {
+        return {};
+    }
+}
+
+function queueFavorite(petId, isFavorite) {
+    const queue = readFavoritesQueue();
+    queue[petId] = isFavorite;
+    localStorage.setItem(FAVORITES_QUEUE_KEY, JSON.stringify(queue));
+}
+
+function dequeueFavorite(petId) {
+    const queue = readFavoritesQueue();
+    if (petId in queue) {
+        delete queue[petId];
+        localStorage.setItem(FAVORITES_QUEUE_KEY, JSON.stringify(queue));
+    }
+}
+
+function flushFavoritesQueue() {
+    const queue = readFavoritesQueue();
+    const changes = Object.entries(queue).map(([pet, isFavorite]) => ({pet: Number(pet), is_favorite: isFavorite}));
+    if (!csrfMeta || changes.length === 0) {
+        return;
+    }
+    fetch('/ajax/favorites/sync/', {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': csrfMeta.content,
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({changes: changes}),
+    })
+    .then(response => {
+        if (!response.ok) {
+            return;
+        }
+        // Пока шел запрос, очередь могла пополниться: убираем только
+        // отправленные изменения
+        const rest = readFavoritesQueue();
+        changes.forEach(change => {
+            if (rest[change.pet] === change.is_favorite) {
+                delete rest[change.pet];
+            }
+        });
+        localStorage.setItem(FAVORITES_QUEUE_KEY, JSON.stringify(rest));
+    })
+    .catch(() => {});
+}
+
+function showFavorite(btn, isFavorite) {
+    btn.textContent = isFavorite ? '💖' : '❤️';
+    btn.title = isFavorite ? 'Удалить из избранного' : 'Добавить в избранное';
+}
+
+if (petsGrid && csrfMeta) {
+    petsGrid.addEventListener('click', function(e) {
+        const btn = e.target.closest('.favorite-btn');
+        if (!btn) {
+            return;
+        }
+        e.preventDefault();
+        const petId = btn.dataset.petId;
+        const wanted = btn.textContent.trim() !== '💖';
+
+        // Отправляем нужное состояние, а не переключение: повтор запроса
+        // (двойной клик, обрыв связи) ничего не ломает
+        fetch(`/ajax/favorite/${petId}/`, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': csrfMeta.content,
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({is_favorite: wanted}),
+        })
+        .then(response => {
+            if (!response.ok) {
+                // Сервер отказал (сессия истекла, питомца нет) - повтор не
+                // поможет, возвращаем кнопку как было
+                showFavorite(btn, !wanted);
+                return;
+            }
+            return response.json().then(data => {
+                dequeueFavorite(petId);
+                showFavorite(btn, data.is_favorite);
+                btn.title = data.message;
+            });
+        }, () => {
+            // Запрос не дошел (нет сети) - отправим, когда связь появится
+            showFavorite(btn, wanted);
+            queueFavorite(petId, wanted);
+        });
+    });
+
+    window.addEventListener('online', flushFavoritesQueue);
+    flushFavoritesQueue();
+}
+
+// Бесконечная прокрутка: следующая порция карточек подгружается, когда
+// пользователь доходит до конца сетки. Без IntersectionObserver остается
+// обычная пагинация.
+if (petsGrid && petsGrid.dataset.nextBatch && 'IntersectionObserver' in window) {
+    let nextUrl = petsGrid.dataset.nextBatch;
+    let loading = false;
+    const nextLink = document.querySelector('.pagination-next');
+    const sentinel = document.createElement('div');
+    petsGrid.after(sentinel);
+    if (nextLink) {
+        nextLink.hidden = true;
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries[0].isIntersecting) {
+            loadBatch();
+        }
+    }, {rootMargin: '600px'});
+
+    function loadBatch() {
+        if (loading || !nextUrl) {
+            return;
+        }
+        loading = true;
+        fetch(nextUrl, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.text();
+            })
+            .then(html => {
+                const batch = document.createElement('template');
+                batch.innerHTML = html;
+                const marker = batch.content.querySelector('.pets-batch-next');
+                nextUrl = marker ? marker.dataset.url : null;
+                if (marker) {
+                    // Обычная ссылка ведет на страницу после уже показанных
+                    // карточек - на случай, если следующая порция не загрузится
+                    if (nextLink) {
+                        nextLink.href = marker.dataset.pageUrl;
+                    }
+                    marker.remove();
+                }
+                petsGrid.append(batch.content);
+                loading = false;
+                if (!nextUrl) {
+                    observer.disconnect();
+                    sentinel.remove();
+                }
+            })
+            .catch(() => {
+                // Ошибка сети: возвращаем обычную ссылку на следующую страницу
+                observer.disconnect();
+                if (nextLink) {
+                    nextLink.hidden = false;
+                }
+            });
+    }
+
+    observer.observe(sentinel);
+}
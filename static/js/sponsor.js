@@ -0,0 +1,36 @@
+// Выбор типа спонсорства
+const sponsorOptions = document.querySelectorAll('.sponsor-option');
+const sponsorshipTypeInput = document.getElementById('sponsorship_type');
+
+sponsorOptions.forEach(option => {
+    option.addEventListener('click', function() {
+        sponsorOptions.forEach(opt => opt.classList.remove('selected'));
+        this.classList.add('selected');
+        sponsorshipTypeInput.value = this.dataset.type;
+    });
+});
+
+// Предустановленные суммы
+const amountPresets = document.querySelectorAll('.amount-preset');
+const amountInput = document.getElementById('amount');
+
+amountPresets.forEach(preset => {
+    preset.addEventListener('click', function() {
+        amountInput.value = this.dataset.amount;
+    });
+});
+
+// Валидация формы
+document.querySelector('.sponsor-form').addEventListener('submit', function(e) {
+    if (!sponsorshipTypeInput.value) {
+        e.preventDefault();
+        alert('Пожалуйста, выберите тип помощи');
+        return;
+    }
+
+    if (!amountInput.value || amountInput.value < 100) {
+        e.preventDefault();
+        alert('Минимальная сумма помощи - 100 рублей');
+        return;
+    }
+});